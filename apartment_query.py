@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# filename          : apartment_query.py
+# description       : Filtering, sorting and keyset pagination for apartment listings
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Builds parameterized SQL for the apartments and
+#                     deleted_apartments tables from API query arguments.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import re
+import json
+import base64
+import sqlite3
+from typing import Any
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+
+BUILDING_PATTERN = re.compile(r"^#?(\d+)-")
+FLOOR_RANK = "CASE floor WHEN 'First Floor' THEN 1 WHEN 'Second Floor' THEN 2 WHEN 'Third Floor' THEN 3 ELSE 99 END"
+SORT_EXPRESSIONS = {
+	"name": "name",
+	"price": "price",
+	"floor": FLOOR_RANK,
+	"updated": "updated_at",
+	"deleted": "deleted_at",
+}
+TABLES = ("apartments", "deleted_apartments")
+MAX_LIMIT = 500
+
+
+class QueryError(ValueError):
+	"""The request's filter, sort or cursor arguments are invalid."""
+
+
+def building_for(name: str) -> str | None:
+	"""Derives the building number from a unit name such as '#183-119'."""
+	match = BUILDING_PATTERN.match(name or "")
+	return match.group(1) if match else None
+
+
+def _placeholders(values: list) -> str:
+	return ", ".join("?" * len(values))
+
+
+def _row_dict(row: sqlite3.Row) -> dict:
+	row = dict(row)
+	del row["sort_value"]
+	return row
+
+
+@dataclass
+class ApartmentQuery:
+	buildings: list[str] = field(default_factory=list)
+	floors: list[str] = field(default_factory=list)
+	styles: list[str] = field(default_factory=list)
+	features: list[str] = field(default_factory=list)
+	min_price: int | None = None
+	max_price: int | None = None
+	updated_only: bool = False
+	sort: str = "name-asc"
+	limit: int | None = None
+	cursor: str | None = None
+
+	@classmethod
+	def from_args(cls, args, default_sort: str = "name-asc") -> 'ApartmentQuery':
+		"""Reads ?building=&floor=&style=&feature= (all repeatable), ?min_price=&max_price=,
+		?updated_only=1, ?sort=<key>-<asc|desc>, ?limit= and ?cursor=."""
+		try:
+			limit = args.get("limit", type=int)
+			if limit is not None and not 1 <= limit <= MAX_LIMIT:
+				raise QueryError(f"limit must be between 1 and {MAX_LIMIT}.")
+			return cls(
+				buildings=args.getlist("building"),
+				floors=args.getlist("floor"),
+				styles=args.getlist("style"),
+				features=sorted(set(args.getlist("feature"))),
+				min_price=args.get("min_price", type=int),
+				max_price=args.get("max_price", type=int),
+				updated_only=args.get("updated_only", "").lower() in ("1", "true", "yes"),
+				sort=args.get("sort", default_sort),
+				limit=limit,
+				cursor=args.get("cursor"),
+			)
+		except (TypeError, ValueError) as e:
+			raise QueryError(str(e)) from e
+
+	@property
+	def paginated(self) -> bool:
+		return self.limit is not None
+
+	def _sort_parts(self, table: str) -> tuple[str, str, str]:
+		key, _, direction = self.sort.partition("-")
+		direction = direction or "asc"
+		if key not in SORT_EXPRESSIONS or direction not in ("asc", "desc") or (key == "deleted" and table != "deleted_apartments"):
+			raise QueryError(f"Unsupported sort: {self.sort}")
+		return key, SORT_EXPRESSIONS[key], direction.upper()
+
+	def _encode_cursor(self, key: str, value, name: str) -> str:
+		return base64.urlsafe_b64encode(json.dumps([key, value, name]).encode("utf-8")).decode("ascii")
+
+	def _decode_cursor(self, key: str) -> tuple:
+		try:
+			cursor_key, value, name = json.loads(base64.urlsafe_b64decode(self.cursor.encode("ascii")))
+		except (ValueError, TypeError) as e:
+			raise QueryError("Malformed cursor.") from e
+		if cursor_key != key:
+			raise QueryError("Cursor belongs to a different sort order.")
+		return value, name
+
+	def execute(self, db: sqlite3.Connection, table: str, select: str = "*") -> sqlite3.Cursor:
+		"""
+		Runs the query and returns the live cursor. Each row carries the `select`
+		columns plus a trailing `sort_value`; with a limit, one extra row is
+		fetched so the caller can tell whether there is a next page.
+		"""
+		if table not in TABLES:
+			raise ValueError(f"Unknown table: {table}")
+		key, expression, direction = self._sort_parts(table)
+		where, params = [], []
+		if table == "deleted_apartments":
+			# Only open vacancy episodes: units that are archived right now.
+			where.append("relisted_at IS NULL")
+		for column, values in (("building", self.buildings), ("floor", self.floors), ("style", self.styles)):
+			if values:
+				where.append(f"{column} IN ({_placeholders(values)})")
+				params.extend(values)
+		if self.min_price is not None:
+			where.append("price >= ?")
+			params.append(self.min_price)
+		if self.max_price is not None:
+			where.append("price <= ?")
+			params.append(self.max_price)
+		if self.updated_only:
+			where.append("updated_at > created_at")
+		if self.features:
+			if table == "apartments":
+				where.append(
+					f"""name IN (
+						SELECT apartment_features.name FROM apartment_features
+						JOIN features ON features.id = apartment_features.feature_id
+						WHERE features.label IN ({_placeholders(self.features)})
+						GROUP BY apartment_features.name HAVING COUNT(*) = ?
+					)"""
+				)
+			else:
+				# Archived rows are not normalized; match against the JSON column directly.
+				where.append(
+					f"""(
+						SELECT COUNT(DISTINCT value) FROM json_each({table}.details)
+						WHERE value IN ({_placeholders(self.features)})
+					) = ?"""
+				)
+			params.extend([*self.features, len(self.features)])
+		if self.cursor:
+			value, name = self._decode_cursor(key)
+			operator = ">" if direction == "ASC" else "<"
+			where.append(f"({expression} {operator} ? OR ({expression} = ? AND name {operator} ?))")
+			params.extend([value, value, name])
+
+		sql = f"SELECT {select}, {expression} AS sort_value FROM {table}"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += f" ORDER BY {expression} {direction}, name {direction}"
+		if self.limit is not None:
+			sql += " LIMIT ?"
+			params.append(self.limit + 1)
+		return db.execute(sql, params)
+
+	def run(self, db: sqlite3.Connection, table: str, select: str = "*",
+	        row_factory: Callable[[sqlite3.Row], Any] = _row_dict) -> tuple[list, str | None]:
+		"""
+		Returns the matching rows converted with `row_factory` (dicts by default)
+		and the cursor of the next page, if any. `select` must include `name`.
+		"""
+		items, last, next_cursor = [], None, None
+		for row in self.execute(db, table, select):
+			if self.limit is not None and len(items) == self.limit:
+				key = self._sort_parts(table)[0]
+				next_cursor = self._encode_cursor(key, last["sort_value"], last["name"])
+				break
+			items.append(row_factory(row))
+			last = row
+		return items, next_cursor
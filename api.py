@@ -4,197 +4,685 @@
 # author            : Rico & Gemini
 # date              : 07-01-2025 # Updated Date
 # version           : v1.5 # Updated Version
-# notes             : Corrected DB initialization call to prevent early exit.
+# notes             : Build the app with create_app(). Importing this module has no
+#                     side effects: Selenium and Chrome are imported when an update
+#                     first runs, and the scheduler only starts when asked to.
 # license           : MIT
 # py version        : 3.10+
 #==============================================================================
 import os
+import hmac
 import json
 import atexit
 import logging
 import sqlite3
-from flask import Flask, jsonify, render_template
+import threading
+from datetime import datetime
+from functools import wraps
+from contextlib import nullcontext
+from flask import Blueprint, Flask, Response, current_app, jsonify, render_template, request, send_file, stream_with_context
 
 try:
 	# CORRECTED: Ensure init_db is imported
-	from database import init_db
+	from database import get_db, init_db, init_app
 	from result import Result
-	from scraper import Scraper
+	from history import get_history, get_price_trend
+	from archive import DAY_SECONDS, get_archive_summary, maintenance_due, run_maintenance
+	from response_cache import ResponseCache, cached_response
+	from streaming import STREAM_BATCH_SIZE, streamed_response, wants_ndjson
+	from change_feed import ChangeNotifier, changes_payload, sse_comment, sse_event
+	from apartment_query import ApartmentQuery, QueryError
+	from update_jobs import JobStore, UpdateJob, UpdateJobRunner
+	from change_detection import sync_targets
+	from update_schedule import AdaptiveSchedule
+	from leader_election import Lease, LeaderElector, LeaseUnavailable
+	import metrics
+	import profiling
 except ImportError as e:
 	logging.error(f"Failed to import required modules: {e}")
 	raise
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-app = Flask(__name__, template_folder='templates', static_folder='static')
+bp = Blueprint('api', __name__)
 
+# Chrome is only needed when the HTTP engine is challenged; keep one warm
+# browser around for that instead of cold-starting Chrome and Xvfb each time.
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", 1))
+BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", 20))
+# Created with the first update, so Selenium is never imported by processes that only serve the API.
+browser_pool = None
+metrics.BROWSER_POOL_BROWSERS.labels(state='idle').set_function(lambda: browser_pool.stats()['idle'] if browser_pool else 0)
+metrics.BROWSER_POOL_BROWSERS.labels(state='in_use').set_function(lambda: browser_pool.stats()['in_use'] if browser_pool else 0)
+# Comma-separated floorplan/bed-count URLs; defaults to scraper.SEARCH_URLS.
+SEARCH_URLS = [url.strip() for url in os.environ.get("SEARCH_URLS", "").split(",") if url.strip()] or None
 full_location_data = {}
+# Apartment name -> map coordinates, compiled from full_location_data.
+coordinate_index = {}
+location_data_mtime = None
+# Serializes reloads; the three values above are only ever replaced together under it.
+location_data_lock = threading.RLock()
 LOCATION_DATA_JSON = "apartment_points_layout_v5 (2).json"
+# Serialized apartment lists, valid until the next sync changes the data.
+response_cache = ResponseCache()
+# Wakes /changes long-polls and streams when a sync writes a new version. Every open
+# stream or long-poll holds a server thread, so their number is capped; waitress_serve
+# sets the cap below its thread count (CHANGE_STREAM_MAX_CLIENTS config) so they can
+# never take every thread.
+change_notifier = ChangeNotifier(max_subscribers=int(os.environ.get("CHANGE_STREAM_MAX_CLIENTS", 16)))
+CHANGE_POLL_RETRY_SECONDS = 30
+MAX_LONG_POLL_SECONDS = 60
+CHANGE_STREAM_KEEPALIVE_SECONDS = 15
+# Closed vacancy episodes older than this are rolled up into archive_summaries
+# (0 keeps them forever); maintenance runs after a sync at most once per interval.
+ARCHIVE_RETENTION_DAYS = float(os.environ.get("ARCHIVE_RETENTION_DAYS", 730))
+ARCHIVE_MAINTENANCE_HOURS = float(os.environ.get("ARCHIVE_MAINTENANCE_HOURS", 24))
+ARCHIVE_VACUUM_FREE_RATIO = float(os.environ.get("ARCHIVE_VACUUM_FREE_RATIO", 0.2))
 
 def load_full_location_data(location_file=LOCATION_DATA_JSON):
-	"""Loads the entire location data (layout and assignments) from the JSON file."""
-	global full_location_data
-	full_location_data = {}
+	"""Loads the entire location data (layout and assignments) from the JSON file.
+	The data, its index and its mtime are built first and published together, so a
+	request never sees one without the others."""
+	global full_location_data, coordinate_index, location_data_mtime
+	data, index, loaded = {}, {}, False
+	mtime = os.path.getmtime(location_file) if os.path.exists(location_file) else None
 
 	if not os.path.exists(location_file):
 		logging.warning(f"Location data file not found: {location_file}. Map points cannot be processed.")
-		return False
-	try:
-		with open(location_file, 'r', encoding='utf-8') as f:
-			data = json.load(f)
-		if isinstance(data, dict) and 'layout' in data and 'assignments' in data:
-			full_location_data = data
-			logging.info(f"Successfully loaded full location data from {location_file}.")
-			return True
-		else:
-			logging.error(f"Invalid structure in {location_file}. Expected 'layout' and 'assignments' keys.")
-			return False
-	except Exception as e:
-		logging.error(f"Error loading full location data: {e}", exc_info=True)
-		return False
-
-def _find_point_index_for_apartment(apartment_name: str, assignments_data: dict | None) -> str | None:
-    """Finds the point_index for a given apartment name from the assignments data."""
-    if not assignments_data:
-        return None
-    for _building_id, building_assignments in assignments_data.items():
+	else:
+		try:
+			with open(location_file, 'r', encoding='utf-8') as f:
+				parsed = json.load(f)
+			if isinstance(parsed, dict) and 'layout' in parsed and 'assignments' in parsed:
+				data, index, loaded = parsed, build_coordinate_index(parsed), True
+				logging.info(f"Successfully loaded full location data from {location_file}.")
+			else:
+				logging.error(f"Invalid structure in {location_file}. Expected 'layout' and 'assignments' keys.")
+		except Exception as e:
+			logging.error(f"Error loading full location data: {e}", exc_info=True)
+
+	with location_data_lock:
+		full_location_data, coordinate_index, location_data_mtime = data, index, mtime
+	return loaded
+
+def build_coordinate_index(location_data: dict) -> dict:
+    """Inverts the assignments into an apartment name -> coordinates lookup.
+    A name assigned to more than one point keeps its first point and is logged."""
+    layout = location_data.get('layout') or {}
+    index = {}
+    assigned_point = {}
+    for building_id, building_assignments in (location_data.get('assignments') or {}).items():
         if not isinstance(building_assignments, dict):
             continue
         for point_idx, apt_name_list in building_assignments.items():
-            if isinstance(apt_name_list, list) and apartment_name in apt_name_list:
-                return str(point_idx)
-    return None
-
-
-# This block is executed when the application starts
-with app.app_context():
-	try:
-		# CORRECTED: Call init_db() instead of the Click command
-		init_db()
-		logging.info("DB initialization check complete.")
-	except sqlite3.OperationalError:
-		# This can happen if the tables already exist, which is fine.
-		logging.info("DB tables likely already exist.")
-	except Exception as e:
-		logging.error(f"Error during DB initialization: {e}", exc_info=True)
-	
-	# Load location data after checking DB
-	load_full_location_data()
-
-
-def run_update_logic():
-    """Core logic for scraping, removing old listings, and updating/adding new ones."""
+            if not isinstance(apt_name_list, list):
+                continue
+            point_idx = str(point_idx)
+            if point_idx not in layout:
+                logging.warning(f"Building {building_id} assigns apartments to unknown point {point_idx}.")
+            for apt_name in apt_name_list:
+                if apt_name in assigned_point:
+                    if assigned_point[apt_name] != point_idx:
+                        logging.warning(f"{apt_name} is assigned to points {assigned_point[apt_name]} and {point_idx}; keeping {assigned_point[apt_name]}.")
+                    continue
+                assigned_point[apt_name] = point_idx
+                index[apt_name] = layout.get(point_idx)
+    return index
+
+def get_coordinate_index(location_file=LOCATION_DATA_JSON) -> dict:
+    """Returns the coordinate index, rebuilding it first if the layout file changed on disk."""
+    try:
+        mtime = os.path.getmtime(location_file)
+    except OSError:
+        mtime = None
+    if not full_location_data or mtime != location_data_mtime:
+        with location_data_lock:
+            # Another thread may have reloaded it while this one waited.
+            if not full_location_data or mtime != location_data_mtime:
+                load_full_location_data(location_file)
+            return coordinate_index
+    return coordinate_index
+
+
+def get_browser_pool():
+    """Returns the shared browser pool, importing the Selenium stack and creating it on first use."""
+    global browser_pool
+    if browser_pool is None:
+        from driver_pool import DriverPool
+        browser_pool = DriverPool(size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES)
+        atexit.register(browser_pool.close)
+    return browser_pool
+
+
+# Admin endpoints (profiling) only exist when ADMIN_TOKEN is set; callers send it as a bearer token.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+# Profiles the next update (PROFILE_NEXT_UPDATE=sample|cprofile) or the next requests to a
+# route (PROFILE_ROUTE=/api/v1/apartments,5,cprofile) from startup, without the admin API.
+PROFILE_NEXT_UPDATE = os.environ.get("PROFILE_NEXT_UPDATE", "")
+PROFILE_ROUTE = os.environ.get("PROFILE_ROUTE", "")
+profiler = profiling.Profiler(os.environ.get("PROFILE_DIR", "profiles"), keep=int(os.environ.get("PROFILE_KEEP", 20)))
+
+def profiling_enabled() -> bool:
+    return bool(ADMIN_TOKEN or PROFILE_NEXT_UPDATE or PROFILE_ROUTE)
+
+def arm_startup_profiles(app: Flask):
+    """Arms the captures asked for by PROFILE_NEXT_UPDATE and PROFILE_ROUTE. A bad value is
+    logged and skipped rather than stopping the server from starting."""
+    if PROFILE_NEXT_UPDATE:
+        try:
+            profiler.arm_update('sample' if PROFILE_NEXT_UPDATE == '1' else PROFILE_NEXT_UPDATE)
+        except ValueError as e:
+            logging.error(f"Ignoring PROFILE_NEXT_UPDATE={PROFILE_NEXT_UPDATE!r}: {e}")
+    if PROFILE_ROUTE:
+        # <rule>[,<count>[,<mode>]]; count defaults to 1 and mode to cprofile.
+        rule, _, rest = PROFILE_ROUTE.partition(',')
+        count, _, mode = rest.partition(',')
+        rule = rule.strip()
+        try:
+            if not any(known.rule == rule for known in app.url_map.iter_rules()):
+                raise ValueError(f"no route has the rule {rule!r}.")
+            count = int(count.strip() or 1)
+            profiler.arm_route(rule, count, mode.strip() or 'cprofile')
+        except ValueError as e:
+            logging.error(f"Ignoring PROFILE_ROUTE={PROFILE_ROUTE!r} (expected <rule>[,<count>[,<mode>]]): {e}")
+
+def update_profile():
+    """A capture of this update run if one was armed, otherwise a no-op context."""
+    mode = profiler.claim_update()
+    if mode is None:
+        return nullcontext()
+    ident = threading.get_ident()
+    # Sampling follows the scrape workers as well as the update thread itself.
+    return profiler.capture('update', 'run_update_logic', mode,
+                            select=lambda thread: thread.ident == ident or thread.name.startswith('scrape'))
+
+def run_update_logic(job: UpdateJob | None = None):
+    """Core logic for scraping, removing old listings, and updating/adding new ones.
+    When run as a background job, per-phase timings and counts are recorded on `job`."""
+    phase = job.phase if job else lambda name: nullcontext()
     scraper = None
     logging.info("Starting apartment data update process...")
     try:
-        scraper = Scraper()
-        results_from_scraper = scraper.get_results()
-
-        scraped_apartment_names = {res.name for res in results_from_scraper}
-        apartments_in_db = Result.get_all()
-        db_apartment_names = {apt.name for apt in apartments_in_db}
-        apartments_to_move = db_apartment_names - scraped_apartment_names
-
-        if apartments_to_move:
-            logging.info(f"Found {len(apartments_to_move)} unavailable apartments to archive.")
-            for name in apartments_to_move:
-                Result.move_to_deleted(name)
-        else:
-            logging.info("No apartments need to be archived.")
-
-        for apartment_result in results_from_scraper:
-            apartment_result.update()
+        with phase('scrape'):
+            from scraper import Scraper
+            scraper = Scraper(pool=get_browser_pool(), search_urls=SEARCH_URLS)
+            results_from_scraper = scraper.get_results()
 
+        if scraper.failed_targets:
+            # Units from a failed target would look unavailable; don't archive on partial data.
+            logging.warning(f"Skipping archive step, {len(scraper.failed_targets)} search target(s) failed.")
+        with phase('sync'):
+            counts = sync_targets(scraper.target_results, scraper.failed_targets)
+        if counts['inserted'] or counts['updated'] or counts['archived']:
+            response_cache.invalidate()
+        if counts.get('version'):
+            change_notifier.publish(counts['version'])
+        if job:
+            job.counts = dict(counts, bytes_transferred=sum(page['bytes'] for page in scraper.page_loads.values()))
+            job.pages = dict(scraper.page_loads)
+        for url, page in scraper.page_loads.items():
+            logging.info(f"Loaded {url} with {page['engine']}: {page['bytes'] / 1024:.0f} KiB, ready in {page['ready_seconds']:.2f}s.")
+        metrics.SYNC_RUNS.labels(mode=counts['mode']).inc()
+        for action in ('inserted', 'updated', 'archived', 'relisted', 'unchanged'):
+            metrics.SYNC_ROWS.labels(action=action).inc(counts[action])
+        logging.info(
+            f"Synced {len(results_from_scraper)} apartments: {counts['inserted']} added, "
+            f"{counts['updated']} updated, {counts['archived']} archived, {counts['unchanged']} unchanged; "
+            f"{counts['observed']} history rows recorded ({counts['mode']} sync)."
+        )
+        db = get_db()
+        if maintenance_due(db, ARCHIVE_MAINTENANCE_HOURS * 3600):
+            with phase('maintenance'):
+                maintenance = run_maintenance(db, ARCHIVE_RETENTION_DAYS * DAY_SECONDS, ARCHIVE_VACUUM_FREE_RATIO)
+            if maintenance['rolled_up']:
+                response_cache.invalidate()
         logging.info("Apartment data update process completed successfully.")
 
     except Exception as e:
         logging.error(f"Error during update process: {e}", exc_info=True)
+        if job:
+            job.fail(e)
     finally:
         if scraper:
+            # Recorded even when the run failed, so a target lost to a challenge backs off as a challenge.
+            if job:
+                job.counts.update(challenged=len(scraper.challenged_targets),
+                                  challenge_failures=len(scraper.blocked_targets),
+                                  challenge_wait_ms=round(sum(scraper.challenge_waits.values()) * 1000))
+            if scraper.challenged_targets:
+                metrics.CHALLENGED_RUNS.inc()
             scraper.close()
             logging.info("Scraper resources have been released.")
 
+# The app whose context update jobs run in; set by create_app.
+update_app = None
+# Every server process serves reads, but only the holder of the 'scheduler' lease runs
+# scheduled updates, and any update (scheduled or manual) must hold the 'update' lease,
+# so at most one scrape writes to the database at a time. Both leases expire this many
+# seconds after their holder stops renewing them.
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS", 60))
+update_lease = None
+leader = None
+
+def run_update_job(job: UpdateJob):
+    """Runs one update job inside an application context on the runner's thread, then
+    schedules the next scheduled update from its outcome."""
+    try:
+        with update_app.app_context(), update_lease.hold(), update_profile():
+            run_update_logic(job)
+    except LeaseUnavailable as e:
+        logging.warning(f"Update job {job.id} skipped: {e}")
+        job.fail(e)
+    finally:
+        metrics.UPDATE_JOBS.labels(trigger=job.trigger, state='failed' if job.error else 'succeeded').inc()
+        schedule_next_update(job)
+
+# Manual and scheduled updates share this runner, so only one scrape runs at a time.
+update_runner = UpdateJobRunner(run_update_job)
+atexit.register(update_runner.shutdown)
+
 def scheduled_update():
     """Function wrapper for scheduled updates via APScheduler."""
-    with app.app_context():
-        run_update_logic()
+    update_runner.run('scheduled')
+
+# Scheduled updates run sooner while listings are changing and back off (with jitter)
+# while they are quiet or the site is failing or challenging us. Bounds are in minutes.
+update_schedule = AdaptiveSchedule(
+    base_interval=float(os.environ.get("UPDATE_INTERVAL_MINUTES", 30)) * 60,
+    min_interval=float(os.environ.get("UPDATE_MIN_INTERVAL_MINUTES", 5)) * 60,
+    max_interval=float(os.environ.get("UPDATE_MAX_INTERVAL_MINUTES", 240)) * 60,
+    challenge_backoff=float(os.environ.get("UPDATE_CHALLENGE_BACKOFF", 3.0)),
+    jitter=float(os.environ.get("UPDATE_INTERVAL_JITTER", 0.1)),
+)
+
+# Only started by start_scheduler(); without it updates run when triggered through the API.
+scheduler = None
+
+def schedule_next_update(job: UpdateJob | None = None):
+    """Replaces the pending scheduled update with one timed by the adaptive schedule.
+    Manual runs count too, so a manual update pushes the next scheduled one back."""
+    if scheduler is None:
+        return
+    decision = update_schedule.decide(job)
+    scheduler.add_job(scheduled_update, 'date', run_date=datetime.fromtimestamp(decision.next_run_at),
+                      id='scheduled_update', replace_existing=True)
+
+def start_scheduler():
+    """Starts scheduled updates in this process. Call it once, from the process that should scrape."""
+    global scheduler
+    if scheduler is not None:
+        return scheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+    scheduler = BackgroundScheduler(daemon=True)
+    schedule_next_update()
+    scheduler.start()
+    return scheduler
+
+def stop_scheduler():
+    """Stops scheduled updates in this process, e.g. after losing the scheduler lease."""
+    global scheduler
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        scheduler = None
 
-scheduler = BackgroundScheduler(daemon=True)
-scheduler.add_job(scheduled_update, 'interval', minutes=30)
-scheduler.start()
-atexit.register(lambda: scheduler.shutdown())
+def start_leader_election():
+    """Competes for the scheduler lease; this process runs the scheduler while it holds it."""
+    global leader
+    if leader is None:
+        leader = LeaderElector(Lease(update_app.config['DATABASE'], 'scheduler', LEASE_SECONDS), start_scheduler, stop_scheduler)
+        leader.start()
+        atexit.register(leader.stop)
+    return leader
+
+
+def with_coordinates(row_json: str, coordinates) -> str:
+    """Appends the coordinates to a row object that SQLite rendered as JSON."""
+    return f'{row_json[:-1]},"coordinates":{json.dumps(coordinates)}}}'
+
+def wants_stream() -> bool:
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes') or wants_ndjson()
+
+def streamed_apartment_list(deleted=False):
+    """Streams a listing batch by batch from the database cursor instead of building it in
+    memory: a JSON array by default, NDJSON when the Accept header asks for
+    application/x-ndjson. Takes the same filters and sort as cached_apartment_list, but no paging."""
+    query = ApartmentQuery.from_args(request.args, default_sort='deleted-desc' if deleted else 'name-asc')
+    if query.limit is not None or query.cursor:
+        raise QueryError("Streamed responses are not paginated; drop limit and cursor.")
+    current_index = get_coordinate_index()
+    batches = (
+        [with_coordinates(row_json, current_index.get(name)) for name, row_json in batch]
+        for batch in Result.iter_json(query, deleted=deleted, batch_size=STREAM_BATCH_SIZE)
+    )
+    return streamed_response(batches, ndjson=wants_ndjson())
+
+def cached_apartment_list(deleted=False):
+    """Serves a filtered listing out of the response cache, rebuilding it when the data
+    version or the layout file has changed since it was cached. See ApartmentQuery.from_args
+    for the query arguments; with ?limit= the list is wrapped as {"items", "next_cursor"}."""
+    query = ApartmentQuery.from_args(request.args, default_sort='deleted-desc' if deleted else 'name-asc')
+    current_index = get_coordinate_index()
+    version, synced_at = Result.data_version()
+
+    def build():
+        rows, next_cursor = Result.search_json(query, deleted=deleted)
+        apartment_list = "[" + ",".join(with_coordinates(row_json, current_index.get(name)) for name, row_json in rows) + "]"
+        if query.paginated:
+            apartment_list = f'{{"items":{apartment_list},"next_cursor":{json.dumps(next_cursor)}}}'
+        return apartment_list.encode('utf-8')
+
+    key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+    entry = response_cache.get_or_build(key, (version, location_data_mtime), synced_at, build)
+    response = cached_response(entry)
+    # Clients pass this back as /changes?since= to fetch only what changed after it.
+    response.headers['X-Data-Version'] = str(version)
+    return response
+
+def parse_since(value) -> int:
+    """Reads ?since= as a sync version, or as a Unix timestamp (>= 1e9) mapped to the version current at that time."""
+    if value in (None, ''):
+        return 0
+    try:
+        since = float(value)
+    except ValueError:
+        raise QueryError("since must be a sync version or a Unix timestamp.")
+    return Result.version_at(since) if since >= 1e9 else int(since)
 
+def build_changes(since: int) -> str:
+    """Serializes what changed after version `since`. A client that has no version, or one
+    from a different database, is told to reset and reload the full lists instead."""
+    version, _ = Result.data_version()
+    if since <= 0 or since > version:
+        return changes_payload(version, since, [], [], reset=True)
+    if since == version:
+        return changes_payload(version, since, [], [])
+    current_index = get_coordinate_index()
+    upserted, archived = Result.changes_since(since)
+    return changes_payload(
+        version, since,
+        [with_coordinates(row_json, current_index.get(name)) for name, row_json in upserted],
+        [with_coordinates(row_json, current_index.get(name)) for name, row_json in archived],
+    )
 
-@app.route('/api/v1/apartments', methods=['GET'])
+@bp.route('/api/v1/apartments', methods=['GET'])
 def get_apartments():
-    """API endpoint to get all available apartments, enriched with coordinates from JSON."""
-    global full_location_data
+    """API endpoint to get all available apartments, enriched with coordinates from JSON.
+    Supports server-side filtering, sorting and cursor pagination (see cached_apartment_list),
+    or a streamed response with ?stream=1 or Accept: application/x-ndjson (see streamed_apartment_list)."""
     try:
-        apartments_from_db = Result.get_all()
-        apartment_list = []
-        if not full_location_data:
-            load_full_location_data()
-        current_assignments = full_location_data.get('assignments')
-        current_layout = full_location_data.get('layout')
-
-        for apt_obj in apartments_from_db:
-            apt_dict = apt_obj.sanitize()
-            apt_name = apt_dict.get('name')
-            coordinates = None
-            if apt_name and current_assignments and current_layout:
-                point_index = _find_point_index_for_apartment(apt_name, current_assignments)
-                if point_index and point_index in current_layout:
-                    coordinates = current_layout[point_index]
-            apt_dict['coordinates'] = coordinates
-            apartment_list.append(apt_dict)
-        return jsonify(apartment_list)
+        return streamed_apartment_list() if wants_stream() else cached_apartment_list()
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching apartments: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch apartment data"}), 500
 
-@app.route('/api/v1/apartments/deleted', methods=['GET'])
+@bp.route('/api/v1/apartments/deleted', methods=['GET'])
 def get_deleted_apartments():
-    """API endpoint to get all deleted/archived apartments."""
-    global full_location_data
+    """API endpoint to get all deleted/archived apartments, with the same query arguments and streaming modes."""
     try:
-        deleted_apartments_from_db = Result.get_all_deleted()
-        deleted_list = []
-        if not full_location_data:
-            load_full_location_data()
-        current_assignments = full_location_data.get('assignments')
-        current_layout = full_location_data.get('layout')
-
-        for apt_obj in deleted_apartments_from_db:
-            apt_dict = apt_obj.sanitize()
-            apt_name = apt_dict.get('name')
-            coordinates = None
-            if apt_name and current_assignments and current_layout:
-                point_index = _find_point_index_for_apartment(apt_name, current_assignments)
-                if point_index and point_index in current_layout:
-                    coordinates = current_layout[point_index]
-            apt_dict['coordinates'] = coordinates
-            deleted_list.append(apt_dict)
-        return jsonify(deleted_list)
+        return streamed_apartment_list(deleted=True) if wants_stream() else cached_apartment_list(deleted=True)
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching deleted apartments: {e}", exc_info=True)
         return jsonify({"error": "Failed to fetch deleted apartment data"}), 500
 
-@app.route('/api/v1/update', methods=['POST'])
+@bp.route('/api/v1/apartments/changes', methods=['GET'])
+def get_apartment_changes():
+    """API endpoint returning the apartments upserted and archived by syncs after ?since=
+    (a version from X-Data-Version or a Unix timestamp). With ?wait=<seconds> it long-polls:
+    if nothing has changed yet, it answers when the next sync lands or the wait runs out.
+    Long-polls share the stream slots; when none is free it answers at once with a
+    Retry-After telling the client when to poll again."""
+    try:
+        since = parse_since(request.args.get('since'))
+        wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_LONG_POLL_SECONDS)
+        refused = False
+        if wait and since > 0:
+            if change_notifier.try_subscribe():
+                try:
+                    change_notifier.wait(since, wait, lambda: Result.data_version()[0])
+                finally:
+                    change_notifier.unsubscribe()
+            else:
+                refused = True
+        response = Response(build_changes(since), mimetype='application/json')
+        response.cache_control.no_cache = True
+        if refused:
+            response.headers['Retry-After'] = str(CHANGE_POLL_RETRY_SECONDS)
+        return response
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error fetching apartment changes: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch apartment changes"}), 500
+
+@bp.route('/api/v1/apartments/changes/stream', methods=['GET'])
+def stream_apartment_changes():
+    """Server-sent events: a 'changes' event (same body as /changes) each time a sync lands,
+    with the version as the event id so reconnects resume from Last-Event-ID."""
+    try:
+        since = parse_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except QueryError as e:
+        return jsonify({"error": str(e)}), 400
+    if not change_notifier.try_subscribe():
+        return jsonify({"error": "Too many change streams open; poll /api/v1/apartments/changes instead."}), 503, {"Retry-After": str(CHANGE_POLL_RETRY_SECONDS)}
+
+    def generate():
+        last_version = since
+        current_version = Result.data_version()[0]
+        if since > current_version:
+            # A version from another database; tell the client to reset straight away.
+            yield sse_event(build_changes(since), event='changes', event_id=current_version)
+            last_version = current_version
+        while True:
+            version = change_notifier.wait(last_version, CHANGE_STREAM_KEEPALIVE_SECONDS, lambda: Result.data_version()[0])
+            if version > last_version:
+                yield sse_event(build_changes(last_version), event='changes', event_id=version)
+                last_version = version
+            else:
+                yield sse_comment()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the generator never started.
+    response.call_on_close(change_notifier.unsubscribe)
+    response.cache_control.no_cache = True
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/api/v1/apartments/<path:name>/history', methods=['GET'])
+def get_apartment_history(name):
+    """API endpoint for one unit's price/availability history. Names start with '#', so URL-encode it as %23."""
+    try:
+        observations = get_history(name)
+        if not observations:
+            return jsonify({"error": f"No history for {name}"}), 404
+        return jsonify({"name": name, "observations": observations})
+    except Exception as e:
+        logging.error(f"Error fetching history for {name}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch apartment history"}), 500
+
+@bp.route('/api/v1/apartments/<path:name>/episodes', methods=['GET'])
+def get_apartment_episodes(name):
+    """API endpoint for every vacancy episode kept for one unit. URL-encode the leading '#' as %23."""
+    try:
+        episodes = Result.get_episodes(name)
+        if not episodes:
+            return jsonify({"error": f"No archived episodes for {name}"}), 404
+        return jsonify({"name": name, "episodes": episodes})
+    except Exception as e:
+        logging.error(f"Error fetching episodes for {name}: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch apartment episodes"}), 500
+
+@bp.route('/api/v1/archive/summary', methods=['GET'])
+def get_archive_summaries():
+    """API endpoint for vacancy episodes rolled up past retention, e.g. ?since=2025-01."""
+    try:
+        return jsonify({
+            "retention_days": ARCHIVE_RETENTION_DAYS,
+            "summaries": get_archive_summary(since=request.args.get('since', '')),
+        })
+    except Exception as e:
+        logging.error(f"Error fetching archive summary: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch archive summary"}), 500
+
+@bp.route('/api/v1/trends', methods=['GET'])
+def get_trends():
+    """API endpoint for price trends, e.g. ?group_by=style&bucket=week&since=<unix timestamp>."""
+    try:
+        trend = get_price_trend(
+            group_by=request.args.get('group_by', 'floor'),
+            bucket=request.args.get('bucket', 'day'),
+            since=request.args.get('since', 0, type=float),
+        )
+        return jsonify(trend)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error fetching price trends: {e}", exc_info=True)
+        return jsonify({"error": "Failed to fetch price trends"}), 500
+
+@bp.route('/api/v1/update', methods=['POST'])
 def trigger_update():
-    """API endpoint to manually trigger the apartment data update."""
+    """API endpoint to manually trigger the apartment data update. Returns 202 straight away;
+    poll the returned status_url for progress. A trigger while an update is already queued or
+    running joins that job instead of starting another."""
     logging.info("Manual update triggered via API.")
-    with app.app_context():
-        run_update_logic()
-    return jsonify({"message": "Apartment data update initiated successfully."}), 200
+    job, created = update_runner.submit('manual')
+    status_url = f"/api/v1/update/{job.id}"
+    message = "Apartment data update initiated successfully." if created else "An update is already in progress."
+    return jsonify({"message": message, "job_id": job.id, "status_url": status_url, "coalesced": not created}), 202, {"Location": status_url}
+
+@bp.route('/api/v1/update/<job_id>', methods=['GET'])
+def get_update_status(job_id):
+    """API endpoint reporting the state, duration and per-phase timings of an update job.
+    Jobs run by another server process are read from the update_jobs table."""
+    status = update_runner.status(job_id)
+    if status is None:
+        return jsonify({"error": f"Unknown update job {job_id}"}), 404
+    return jsonify(status)
+
+@bp.route('/api/v1/schedule', methods=['GET'])
+def get_update_schedule():
+    """API endpoint reporting the current update interval, the next run and recent scheduling decisions.
+    With several server processes this is the answering process's view: only the
+    scheduler lease holder (see `leader`) has a schedule of its own."""
+    return jsonify(dict(update_schedule.to_dict(), enabled=scheduler is not None,
+                        leader=leader.to_dict() if leader else None))
+
+@bp.route('/api/v1/browser-pool', methods=['GET'])
+def get_browser_pool_stats():
+    """API endpoint reporting warm vs. cold browser acquisition latency; empty until the first update."""
+    return jsonify(browser_pool.stats() if browser_pool else {})
 
-@app.route('/')
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Exposes scrape, sync and API metrics in the Prometheus text format. Metrics are per
+    process: with several server processes, each response covers only the one that served it."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+def admin_required(view):
+    """Hides the view unless ADMIN_TOKEN is set and requires it as `Authorization: Bearer <token>`."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@bp.route('/api/v1/admin/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Admin endpoint listing armed captures and the saved profiles, newest first."""
+    return jsonify(dict(profiler.to_dict(), profiles=profiler.list()))
+
+@bp.route('/api/v1/admin/profiles', methods=['POST'])
+@admin_required
+def arm_profile():
+    """Admin endpoint arming a capture: {"target": "update", "mode": "sample"} profiles the next
+    update run; {"target": "route", "rule": "/api/v1/apartments", "count": 5, "mode": "cprofile"}
+    profiles the next requests to that route."""
+    body = request.get_json(silent=True) or {}
+    try:
+        if body.get('target') == 'update':
+            profiler.arm_update(body.get('mode', 'sample'))
+        elif body.get('target') == 'route':
+            rule = body.get('rule', '')
+            if not any(known.rule == rule for known in current_app.url_map.iter_rules()):
+                raise ValueError(f"Unknown route {rule!r}; use the rule as registered, e.g. /api/v1/apartments.")
+            profiler.arm_route(rule, int(body.get('count', 1)), body.get('mode', 'cprofile'))
+        else:
+            raise ValueError('target must be "update" or "route".')
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(profiler.to_dict()), 202
+
+@bp.route('/api/v1/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """Admin endpoint downloading a saved profile, ?format=pstats (cProfile captures only) or ?format=collapsed."""
+    path = profiler.path(name)
+    if path is None:
+        return jsonify({"error": f"Unknown profile {name}"}), 404
+    output = request.args.get('format', 'pstats' if name.endswith('.prof') else 'collapsed')
+    if output == 'pstats' and name.endswith('.prof'):
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+    if output == 'collapsed':
+        if name.endswith('.collapsed'):
+            return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+        return Response(profiling.pstats_to_collapsed(path), mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={name.removesuffix(".prof")}.collapsed'})
+    return jsonify({"error": f"{name} cannot be downloaded as {output}"}), 400
+
+@bp.route('/')
 def index():
     """Serves the main HTML page."""
     return render_template('index.html')
 
+def create_app(config: dict | None = None, start_updates: bool = False) -> Flask:
+    """
+    Application factory: creates the Flask app, applies `config` over the defaults and
+    makes sure the database schema is current. With `start_updates` the process joins
+    the election for the scheduler lease and runs scheduled updates while it leads;
+    without it (tests, CLI commands) nothing is scheduled. `flask --app api` finds
+    this factory on its own.
+    """
+    global update_app, update_lease
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    app = Flask(__name__, template_folder='templates', static_folder='static')
+    app.config['DATABASE'] = os.environ.get('APARTMENTS_DATABASE', 'database.db')
+    app.config.update(config or {})
+    if 'CHANGE_STREAM_MAX_CLIENTS' in app.config:
+        change_notifier.max_subscribers = int(app.config['CHANGE_STREAM_MAX_CLIENTS'])
+    init_app(app)
+    metrics.init_app(app)
+    app.register_blueprint(bp)
+    update_app = app
+    update_lease = Lease(app.config['DATABASE'], 'update', LEASE_SECONDS)
+    update_runner.store = JobStore(app.config['DATABASE'])
+
+    with app.app_context():
+        try:
+            init_db()
+            logging.info("DB initialization check complete.")
+        except sqlite3.OperationalError:
+            # This can happen if the tables already exist, which is fine.
+            logging.info("DB tables likely already exist.")
+        except Exception as e:
+            logging.error(f"Error during DB initialization: {e}", exc_info=True)
+
+    # The request hooks are only installed when profiling is enabled, so they cost nothing otherwise.
+    if profiling_enabled():
+        profiling.init_app(app, profiler)
+        arm_startup_profiles(app)
+
+    if start_updates:
+        start_leader_election()
+    return app
+
 if __name__ == '__main__':
     # This block is for direct execution, e.g., for local debugging.
     # Production runs should use a WSGI server like Waitress or Gunicorn.
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app(start_updates=True).run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# filename          : archive.py
+# description       : Retention, roll-up and VACUUM/ANALYZE for archived vacancy episodes
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Closed episodes older than the retention period are folded
+#                     into archive_summaries (per month, building, floor and style)
+#                     and deleted, so deleted_apartments stops growing without
+#                     losing the long-run vacancy statistics.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import logging
+import sqlite3
+from time import time
+
+try:
+	from database import get_db
+except ImportError:
+	def get_db(): raise RuntimeError("get_db function not available")
+
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def compact_archive(db: sqlite3.Connection, retention_seconds: float, now: float | None = None) -> int:
+	"""
+	Rolls closed episodes archived more than `retention_seconds` ago into
+	archive_summaries and deletes them. Open episodes (units still archived)
+	are always kept. Returns the number of episodes rolled up.
+	"""
+	if retention_seconds <= 0:
+		return 0
+	cutoff = (time() if now is None else now) - retention_seconds
+	with db:
+		# An upsert from a SELECT needs a WHERE clause for SQLite to parse ON CONFLICT;
+		# the cutoff filter below serves, so keep one if the filter ever changes.
+		db.execute(
+			"""INSERT INTO archive_summaries (period, building, floor, style, episodes, price_sum, price_min, price_max, listed_seconds_sum)
+			   SELECT strftime('%Y-%m', deleted_at, 'unixepoch'), COALESCE(building, ''), floor, COALESCE(style, ''),
+			          COUNT(*), SUM(price), MIN(price), MAX(price), SUM(deleted_at - created_at)
+			   FROM deleted_apartments
+			   WHERE deleted_at < ? AND relisted_at IS NOT NULL
+			   GROUP BY 1, 2, 3, 4
+			   ON CONFLICT (period, building, floor, style) DO UPDATE SET
+			       episodes = episodes + excluded.episodes,
+			       price_sum = price_sum + excluded.price_sum,
+			       price_min = MIN(price_min, excluded.price_min),
+			       price_max = MAX(price_max, excluded.price_max),
+			       listed_seconds_sum = listed_seconds_sum + excluded.listed_seconds_sum""",
+			(cutoff,)
+		)
+		rolled_up = db.execute(
+			"DELETE FROM deleted_apartments WHERE deleted_at < ? AND relisted_at IS NOT NULL",
+			(cutoff,)
+		).rowcount
+	return rolled_up
+
+
+def maintenance_due(db: sqlite3.Connection, interval_seconds: float, now: float | None = None) -> bool:
+	"""True when the last maintenance run is at least `interval_seconds` old, or there has been none."""
+	if interval_seconds <= 0:
+		return False
+	last = db.execute("SELECT MAX(ran_at) FROM maintenance_runs").fetchone()[0]
+	return last is None or (time() if now is None else now) - last >= interval_seconds
+
+
+def run_maintenance(db: sqlite3.Connection, retention_seconds: float, vacuum_free_ratio: float = 0.2) -> dict:
+	"""
+	Compacts the archive, refreshes the query planner statistics and, when at
+	least `vacuum_free_ratio` of the file is free pages, rebuilds it with
+	VACUUM. VACUUM copies the whole database and blocks writers while it runs,
+	so it is skipped until enough space can be given back.
+	"""
+	now = time()
+	rolled_up = compact_archive(db, retention_seconds, now)
+	db.execute("ANALYZE")
+	page_count = db.execute("PRAGMA page_count").fetchone()[0]
+	free_pages = db.execute("PRAGMA freelist_count").fetchone()[0]
+	vacuumed = bool(page_count) and free_pages / page_count >= vacuum_free_ratio
+	if vacuumed:
+		# VACUUM cannot run inside a transaction.
+		db.commit()
+		db.execute("VACUUM")
+	with db:
+		db.execute(
+			"INSERT INTO maintenance_runs (ran_at, rolled_up, vacuumed) VALUES (?, ?, ?)",
+			(now, rolled_up, int(vacuumed))
+		)
+	logging.info(
+		f"Archive maintenance: {rolled_up} episode(s) rolled up, "
+		f"{free_pages}/{page_count} pages free, {'vacuumed' if vacuumed else 'no vacuum'}."
+	)
+	return {"rolled_up": rolled_up, "page_count": page_count, "free_pages": free_pages, "vacuumed": vacuumed}
+
+
+def get_archive_summary(since: str = "") -> list[dict]:
+	"""Rolled-up episodes per month (from 'YYYY-MM' `since`) and unit type, with average price and days listed."""
+	rows = get_db().execute(
+		"""SELECT period, NULLIF(building, '') AS building, floor, NULLIF(style, '') AS style, episodes,
+		          price_min, price_max, ROUND(CAST(price_sum AS REAL) / episodes, 2) AS avg_price,
+		          ROUND(listed_seconds_sum / episodes / ?, 2) AS avg_days_listed
+		   FROM archive_summaries WHERE period >= ?
+		   ORDER BY period, building, floor, style""",
+		(DAY_SECONDS, since)
+	)
+	return [dict(row) for row in rows]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# filename          : bench_http_engine.py
+# description       : Exercises the HTTP fetch engine against a local stand-in site
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : python benchmarks/bench_http_engine.py [--rounds 20]
+# notes             : Checks parity with the saved results and challenge detection.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import sys
+import argparse
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_engine import HttpEngine, ChallengeDetected
+from listing_parser import parse_results
+from listing_fixture import load_listing_html, load_units
+from listing_server import serve_listing
+
+
+SEARCH_PATH = "/floorplans/highwood?Beds=1"
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--rounds", type=int, default=20)
+	args = parser.parse_args()
+
+	engine = HttpEngine(timeout=5)
+	expected = [unit["name"] for unit in load_units()]
+
+	with serve_listing({SEARCH_PATH: load_listing_html()}) as server:
+		url = server.base_url + SEARCH_PATH
+		timings = []
+		for _ in range(args.rounds):
+			tic = perf_counter()
+			results = parse_results(engine.fetch(url))
+			timings.append(perf_counter() - tic)
+		assert [result.name for result in results] == expected, "HTTP engine results differ from results.json."
+
+	with serve_listing({SEARCH_PATH: load_listing_html()}, challenge=True) as server:
+		try:
+			engine.fetch(server.base_url + SEARCH_PATH)
+		except ChallengeDetected:
+			challenge_detected = True
+		else:
+			challenge_detected = False
+		assert challenge_detected, "Challenge page was not detected."
+
+	print(f"Rows: {len(results)}")
+	print(f"Fetch + parse (best):   {min(timings) * 1000:8.2f} ms")
+	print(f"Fetch + parse (median): {sorted(timings)[len(timings) // 2] * 1000:8.2f} ms")
+	print("Challenge detection:    ok")
+
+
+if __name__ == "__main__":
+	main()
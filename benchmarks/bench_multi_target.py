@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# filename          : bench_multi_target.py
+# description       : Sequential vs. concurrent scraping of several search targets
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : python benchmarks/bench_multi_target.py [--targets 4] [--delay 0.5]
+# notes             : Uses the HTTP engine against the local stand-in with an
+#                     artificial per-page delay standing in for network latency.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import sys
+import argparse
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_engine import HttpEngine
+from listing_parser import parse_results
+from scrape_targets import scrape_targets, merge_results
+from listing_fixture import load_units, render_listing_html
+from listing_server import serve_listing
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument("--targets", type=int, default=4)
+	parser.add_argument("--delay", type=float, default=0.5)
+	args = parser.parse_args()
+
+	units = load_units()
+	# Every target repeats the first half of the units so the merge has duplicates to drop.
+	pages = {
+		f"/floorplans/plan-{index}?Beds=1": render_listing_html(units[:len(units) // 2] + [dict(unit, name=f"{unit['name']}-{index}") for unit in units[len(units) // 2:]])
+		for index in range(args.targets)
+	}
+	engine = HttpEngine(timeout=10)
+
+	def scrape_one(url: str, timeout: float):
+		return parse_results(engine.fetch(url, timeout=timeout))
+
+	with serve_listing(pages, delay=args.delay) as server:
+		urls = [server.base_url + path for path in pages]
+
+		tic = perf_counter()
+		sequential = merge_results(scrape_targets(urls, scrape_one, max_workers=1)[0])
+		sequential_time = perf_counter() - tic
+
+		tic = perf_counter()
+		results_by_url, failed = scrape_targets(urls, scrape_one, max_workers=args.targets)
+		concurrent = merge_results(results_by_url)
+		concurrent_time = perf_counter() - tic
+
+	assert not failed
+	assert [r.name for r in sequential] == [r.name for r in concurrent]
+	expected = len(units) // 2 + args.targets * (len(units) - len(units) // 2)
+	assert len(concurrent) == expected, f"Expected {expected} unique units, got {len(concurrent)}."
+	print(f"Targets: {args.targets}, unique units: {len(concurrent)}")
+	print(f"Sequential:  {sequential_time:6.2f} s")
+	print(f"Concurrent:  {concurrent_time:6.2f} s")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# filename          : bench_parse.py
+# description       : Compares per-row and single-parse listing extraction
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : python benchmarks/bench_parse.py [--repeat 10] [--rounds 50]
+# notes             : The legacy path re-serializes each row to stand in for the
+#                     per-row get_attribute("outerHTML") call, so the WebDriver
+#                     round-trip itself is not included and the real saving is larger.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import sys
+import argparse
+from timeit import repeat as timeit_repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lxml.html
+
+from result import Result
+from element_find import find_elements_by_xpath
+from listing_parser import UNIT_ROWS, parse_document, parse_results
+from listing_fixture import load_listing_html, load_units, render_listing_html
+
+
+def legacy_extract(html: str) -> list[Result]:
+	"""The pre-v1.0 extraction loop: one outerHTML and four parses per row."""
+	result_obj_list = []
+	for row in UNIT_ROWS(parse_document(html)):
+		result = lxml.html.tostring(row, encoding="unicode")
+		name = find_elements_by_xpath(result, ".//td[@class='td-card-name']/text()")[-1].strip()
+		price = find_elements_by_xpath(result, ".//td[@class='td-card-rent']/text()")[-2].strip()
+		price = int(price.replace("$", "").replace(",", "")) if price else 0
+		page_url = find_elements_by_xpath(result, ".//td[@class='td-card-footer']/a/@href")[0].strip()
+		details = find_elements_by_xpath(result, ".//td[@class='td-card-details']/ul/li/text()")
+		details = [detail.strip("- ") for detail in details]
+		floor = details[0]
+		details.pop(0)
+		if len(details) > 1:
+			style = details[0]
+			details.pop(0)
+		else:
+			style = None
+		result_obj_list.append(Result(name=name, floor=floor, style=style, page_url=page_url, price=price, details=details))
+	return result_obj_list
+
+
+def best_of(function, html: str, rounds: int) -> float:
+	return min(timeit_repeat(lambda: function(html), number=1, repeat=rounds))
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--repeat", type=int, default=10, help="Multiply the fixture rows to simulate a larger page.")
+	parser.add_argument("--rounds", type=int, default=50)
+	args = parser.parse_args()
+
+	html = load_listing_html() if args.repeat == 1 else render_listing_html(load_units(), repeat=args.repeat)
+	legacy, single = legacy_extract(html), parse_results(html)
+	assert [r.sanitize() for r in legacy] == [r.sanitize() for r in single], "Extraction paths disagree."
+
+	legacy_time = best_of(legacy_extract, html, args.rounds)
+	single_time = best_of(parse_results, html, args.rounds)
+	print(f"Rows: {len(single)}")
+	print(f"Per-row parse:  {legacy_time * 1000:8.2f} ms")
+	print(f"Single parse:   {single_time * 1000:8.2f} ms")
+	print(f"Speedup:        {legacy_time / single_time:8.2f}x")
+
+
+if __name__ == "__main__":
+	main()
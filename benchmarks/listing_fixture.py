@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# filename          : listing_fixture.py
+# description       : Renders saved scrape results back into floorplan page markup
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : python benchmarks/listing_fixture.py
+# notes             : Regenerates benchmarks/fixtures/floorplans.html from results.json.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import json
+import random
+from html import escape
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_JSON = os.path.join(ROOT_DIR, "results.json")
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LISTING_HTML = os.path.join(FIXTURE_DIR, "floorplans.html")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Floor Plans | Villages on McKnight</title>
+</head>
+<body>
+<div class="nudge-container"><button onclick="ysi.nudge.closeNudge();">Close</button></div>
+<table class="table availability-table">
+<tbody>
+{rows}
+</tbody>
+</table>
+</body>
+</html>
+"""
+
+ROW_TEMPLATE = """<tr class="unit-container" data-selenium-id="{name}">
+<td class="td-card-name"><span class="td-card-label">Apartment:</span>{name}</td>
+<td class="td-card-rent"><span class="td-card-label">Rent:</span>${price:,}<span class="td-card-period">/month</span>
+</td>
+<td class="td-card-details"><ul>{details}</ul></td>
+<td class="td-card-footer"><a class="btn" href="{page_url}">Apply Now</a></td>
+</tr>"""
+
+
+def load_units(path: str = RESULTS_JSON) -> list[dict]:
+	with open(path, "r", encoding="utf8") as file:
+		return json.load(file)
+
+
+def synthetic_units(count: int, seed: int = 0) -> list[dict]:
+	"""`count` units modelled on results.json with unique '#<building>-<unit>' names and jittered prices."""
+	base = load_units()
+	rng = random.Random(seed)
+	units = []
+	for i in range(count):
+		unit = dict(base[i % len(base)])
+		unit["name"] = f"#{100 + i // 40}-{100 + i % 40}"
+		unit["price"] = max(0, unit["price"] + rng.randint(-150, 150))
+		unit["details"] = list(unit["details"])
+		units.append(unit)
+	return units
+
+
+def render_row(unit: dict, suffix: str = "") -> str:
+	items = [unit["floor"]] + ([unit["style"]] if unit["style"] else []) + unit["details"]
+	return ROW_TEMPLATE.format(
+		name=escape(unit["name"] + suffix),
+		price=unit["price"],
+		details="".join(f"<li>- {escape(item)}</li>" for item in items),
+		page_url=escape(unit["page_url"]),
+	)
+
+
+def render_listing_html(units: list[dict], repeat: int = 1) -> str:
+	"""Renders `units` as a floorplan page; `repeat` > 1 simulates larger pages with unique names."""
+	rows = [
+		render_row(unit, suffix="" if copy == 0 else f"-{copy}")
+		for copy in range(repeat)
+		for unit in units
+	]
+	return PAGE_TEMPLATE.format(rows="\n".join(rows))
+
+
+def load_listing_html(path: str = LISTING_HTML) -> str:
+	with open(path, "r", encoding="utf8") as file:
+		return file.read()
+
+
+def main():
+	os.makedirs(FIXTURE_DIR, exist_ok=True)
+	with open(LISTING_HTML, "w", encoding="utf8") as file:
+		file.write(render_listing_html(load_units()))
+	print(f"Wrote {LISTING_HTML}.")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# filename          : listing_server.py
+# description       : Local HTTP stand-in for the floorplans site
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Serves the saved listing HTML, optionally as a challenge page.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import gzip
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CHALLENGE_HTML = """<!DOCTYPE html><html><head><title>Just a moment...</title></head>
+<body><noscript>Enable JavaScript and cookies to continue</noscript></body></html>"""
+
+
+class ListingServer(ThreadingHTTPServer):
+	daemon_threads = True
+
+	def __init__(self, pages: dict[str, str], challenge: bool = False, delay: float = 0):
+		super().__init__(("127.0.0.1", 0), ListingHandler)
+		self.pages = pages
+		self.challenge = challenge
+		self.delay = delay
+		self.hits = 0
+
+	@property
+	def base_url(self) -> str:
+		return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+	server: ListingServer
+
+	def do_GET(self):
+		self.server.hits += 1
+		if self.server.delay:
+			threading.Event().wait(self.server.delay)
+		if self.server.challenge:
+			self.send_page(503, CHALLENGE_HTML)
+		elif self.path in self.server.pages:
+			self.send_page(200, self.server.pages[self.path])
+		else:
+			self.send_page(404, "<html><head><title>Not Found</title></head></html>")
+
+	def send_page(self, status: int, html: str):
+		body = html.encode("utf8")
+		gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+		if gzipped:
+			body = gzip.compress(body)
+		self.send_response(status)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		if gzipped:
+			self.send_header("Content-Encoding", "gzip")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+@contextmanager
+def serve_listing(pages: dict[str, str], challenge: bool = False, delay: float = 0):
+	"""Runs a ListingServer on a free local port for the duration of the block."""
+	server = ListingServer(pages, challenge=challenge, delay=delay)
+	thread = threading.Thread(target=server.serve_forever, daemon=True)
+	thread.start()
+	try:
+		yield server
+	finally:
+		server.shutdown()
+		server.server_close()
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+# filename          : run.py
+# description       : Offline benchmark suite for the scrape, sync and API hot paths
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : python benchmarks/run.py [--units 5000] [--rounds 5] [--only sync_update]
+#                     python benchmarks/run.py --save-baseline
+# notes             : Runs against the recorded floorplan fixture, the layout JSON and
+#                     a synthetic database in a temp directory; nothing touches the
+#                     live site or database.db. Results are written as JSON and, when
+#                     benchmarks/baseline.json exists, compared against it; any case
+#                     slower than the baseline by more than --threshold is flagged and
+#                     the exit status is 1. Baselines are machine-specific, so save
+#                     one on the machine you compare on.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import itertools
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from time import perf_counter, time
+from collections.abc import Callable
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from listing_fixture import load_units, render_listing_html, synthetic_units
+
+
+BASELINE_JSON = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_JSON = os.path.join(BENCHMARK_DIR, "results", "latest.json")
+
+# name -> function(context) returning (callable to time, operations per call, setup run before each call or None)
+# and optionally a dict of extra measurements to store with the timings. A case that cannot
+# run in this environment returns None and is skipped.
+BENCHMARKS: dict[str, Callable] = {}
+
+
+def benchmark(function: Callable) -> Callable:
+	BENCHMARKS[function.__name__.removeprefix("bench_")] = function
+	return function
+
+
+def measure(function: Callable[[], object], rounds: int, setup: Callable[[], object] | None = None) -> dict:
+	timings = []
+	for _ in range(rounds):
+		if setup is not None:
+			setup()
+		tic = perf_counter()
+		function()
+		timings.append(perf_counter() - tic)
+	return {"best": min(timings), "median": statistics.median(timings), "rounds": rounds}
+
+
+class Context:
+	"""Shared state for one suite run: the temp directory, the Flask app and the synthetic data."""
+
+	def __init__(self, units: int, archived: int, page_repeat: int, workdir: str):
+		self.units = synthetic_units(units + archived)
+		self.active_units = self.units[:units]
+		self.archived = archived
+		self.page_repeat = page_repeat
+		self.workdir = workdir
+		self._db_counter = 0
+		self.main_db = self.fresh_db_path()
+		import api
+		self.api = api
+		self.app = api.create_app({"DATABASE": self.main_db})
+		self.client = self.app.test_client()
+		with self.app.app_context():
+			api.Result.sync_all(self.results(self.units))
+			api.Result.sync_all(self.results(self.active_units))
+
+	def fresh_db_path(self) -> str:
+		self._db_counter += 1
+		return os.path.join(self.workdir, f"bench-{self._db_counter}.db")
+
+	@staticmethod
+	def results(units: list[dict]) -> list:
+		from result import Result
+		return [Result(**unit) for unit in units]
+
+	def app_context(self, database: str | None = None):
+		self.app.config["DATABASE"] = database or self.main_db
+		return self.app.app_context()
+
+
+@benchmark
+def bench_parse(context: Context):
+	html = render_listing_html(load_units(), repeat=context.page_repeat)
+	from listing_parser import parse_results
+	rows = len(parse_results(html))
+	return lambda: parse_results(html), rows, None
+
+
+def bytes_per_item(build: Callable[[], list]) -> float:
+	"""Average memory retained per item of the list `build` returns."""
+	tracemalloc.start()
+	try:
+		before = tracemalloc.get_traced_memory()[0]
+		items = build()
+		retained = tracemalloc.get_traced_memory()[0] - before
+	finally:
+		tracemalloc.stop()
+	return round(retained / max(1, len(items)), 1)
+
+
+def peak_bytes(function: Callable[[], object]) -> int:
+	"""Peak traced memory while `function` runs."""
+	tracemalloc.start()
+	try:
+		function()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+@benchmark
+def bench_result_construction(context: Context):
+	from result import Result
+	units = context.active_units
+	build = lambda: [Result(**unit) for unit in units]
+	return build, len(units), None, {"bytes_per_row": bytes_per_item(build)}
+
+
+@benchmark
+def bench_result_from_db(context: Context):
+	"""Loads every apartment as a Result straight off the cursor."""
+	from result import Result
+	with context.app_context():
+		memory = bytes_per_item(Result.get_all)
+
+	def run():
+		with context.app_context():
+			Result.get_all()
+	return run, len(context.active_units), None, {"bytes_per_row": memory}
+
+
+@benchmark
+def bench_serialize_sanitize(context: Context):
+	"""Result objects -> sanitize() dicts -> json.dumps, the pre-search_json response path."""
+	from result import Result
+	from apartment_query import ApartmentQuery
+
+	def run():
+		with context.app_context():
+			results, _next_cursor = Result.search(ApartmentQuery())
+			return json.dumps([result.sanitize() for result in results]).encode("utf-8")
+	return run, len(context.active_units), None
+
+
+@benchmark
+def bench_serialize_search_json(context: Context):
+	"""Rows rendered to JSON by SQLite and joined, the /api/v1/apartments response path."""
+	from result import Result
+	from apartment_query import ApartmentQuery
+
+	def run():
+		with context.app_context():
+			rows, _next_cursor = Result.search_json(ApartmentQuery())
+			return ("[" + ",".join(row_json for _name, row_json in rows) + "]").encode("utf-8")
+	return run, len(context.active_units), None
+
+
+@benchmark
+def bench_sync_insert(context: Context):
+	"""Full sync of every unit into an empty database."""
+	results = context.results(context.active_units)
+	paths = []
+
+	def setup():
+		paths.append(context.fresh_db_path())
+		with context.app_context(paths[-1]):
+			context.api.init_db()
+
+	def run():
+		with context.app_context(paths[-1]):
+			context.api.Result.sync_all(results)
+	return run, len(results), setup
+
+
+@benchmark
+def bench_sync_update(context: Context):
+	"""Full sync where 10% of the prices changed since the previous run."""
+	variants = []
+	for offset in (1, 2):
+		units = [dict(unit, price=unit["price"] + offset) if i % 10 == 0 else unit for i, unit in enumerate(context.active_units)]
+		variants.append(context.results(units))
+	next_variant = itertools.cycle(variants).__next__
+
+	def run():
+		with context.app_context():
+			context.api.Result.sync_all(next_variant())
+	return run, len(context.active_units), None
+
+
+@benchmark
+def bench_sync_unchanged(context: Context):
+	"""Full sync with nothing to write."""
+	results = context.results(context.active_units)
+	with context.app_context():
+		context.api.Result.sync_all(results)
+
+	def run():
+		with context.app_context():
+			context.api.Result.sync_all(results)
+	return run, len(results), None
+
+
+def _get(context: Context, path: str) -> int:
+	response = context.client.get(path)
+	assert response.status_code == 200, f"{path} returned {response.status_code}"
+	return len(response.get_data())
+
+
+@benchmark
+def bench_api_apartments(context: Context):
+	"""GET /api/v1/apartments with an empty response cache: query, serialization and compression."""
+	context.app.config["DATABASE"] = context.main_db
+	return lambda: _get(context, "/api/v1/apartments"), len(context.active_units), context.api.response_cache.invalidate
+
+
+@benchmark
+def bench_api_apartments_cached(context: Context):
+	context.app.config["DATABASE"] = context.main_db
+	_get(context, "/api/v1/apartments")
+	return lambda: _get(context, "/api/v1/apartments"), len(context.active_units), None
+
+
+def _drain(context: Context, path: str, headers: dict | None = None) -> int:
+	"""Reads a response chunk by chunk without keeping the body, like a streaming client would."""
+	response = context.client.get(path, headers=headers, buffered=False)
+	assert response.status_code == 200, f"{path} returned {response.status_code}"
+	try:
+		return sum(len(chunk) for chunk in response.response)
+	finally:
+		response.close()
+
+
+@benchmark
+def bench_api_apartments_deleted(context: Context):
+	context.app.config["DATABASE"] = context.main_db
+	run = lambda: _drain(context, "/api/v1/apartments/deleted")
+	context.api.response_cache.invalidate()
+	return run, context.archived, context.api.response_cache.invalidate, {"peak_bytes": peak_bytes(run)}
+
+
+@benchmark
+def bench_api_apartments_deleted_stream(context: Context):
+	"""The same list streamed from the cursor as a JSON array; peak memory should not grow with the row count."""
+	context.app.config["DATABASE"] = context.main_db
+	run = lambda: _drain(context, "/api/v1/apartments/deleted?stream=1")
+	return run, context.archived, None, {"peak_bytes": peak_bytes(run)}
+
+
+@benchmark
+def bench_api_apartments_ndjson(context: Context):
+	context.app.config["DATABASE"] = context.main_db
+	run = lambda: _drain(context, "/api/v1/apartments", {"Accept": "application/x-ndjson"})
+	return run, len(context.active_units), None, {"peak_bytes": peak_bytes(run)}
+
+
+@benchmark
+def bench_coordinate_lookup(context: Context):
+	"""Coordinate lookups for every synthetic unit plus every unit assigned in the layout JSON."""
+	index = context.api.get_coordinate_index()
+	names = [unit["name"] for unit in context.active_units] + list(index)
+	return lambda: [index.get(name) for name in names], len(names), None
+
+
+@benchmark
+def bench_coordinate_index_build(context: Context):
+	context.api.get_coordinate_index()
+	location_data = context.api.full_location_data
+	return lambda: context.api.build_coordinate_index(location_data), len(context.api.coordinate_index), None
+
+
+# Run in a fresh interpreter: imports `modules`, builds the app and reports the time that
+# took and the process's peak RSS. Linux reports ru_maxrss in KiB.
+STARTUP_SCRIPT = """
+import json, resource, sys
+from time import perf_counter
+tic = perf_counter()
+for module in sys.argv[1:]:
+	__import__(module)
+import api
+api.create_app()
+print(json.dumps({"seconds": perf_counter() - tic, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def _startup(context: Context, modules: tuple[str, ...] = ()):
+	"""Times a cold interpreter importing api and creating the app, plus the child's own numbers."""
+	env = dict(os.environ, APARTMENTS_DATABASE=context.fresh_db_path())
+	command = [sys.executable, "-c", STARTUP_SCRIPT, *modules]
+	probe = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+	if probe.returncode:
+		print(f"Startup probe failed: {probe.stderr.strip().splitlines()[-1]}", file=sys.stderr)
+		return None
+	child = json.loads(probe.stdout.strip().splitlines()[-1])
+	run = lambda: subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, check=True)
+	return run, 1, None, {"import_seconds": round(child["seconds"], 4), "max_rss_kb": child["max_rss_kb"]}
+
+
+@benchmark
+def bench_startup_api(context: Context):
+	"""Interpreter start, `import api` and create_app(), as paid by every worker, test and CLI call."""
+	return _startup(context)
+
+
+@benchmark
+def bench_startup_api_with_scraper(context: Context):
+	"""The same with the Selenium/Chrome stack imported up front, as api did before it was lazy."""
+	return _startup(context, ("scraper", "driver_pool"))
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+	"""Names of cases whose best time is more than `threshold` slower than the baseline."""
+	regressions = []
+	print(f"\n{'case':<28}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+	for name, current in results.items():
+		previous = baseline.get(name)
+		if previous is None:
+			print(f"{name:<28}{'-':>14}{current['best'] * 1000:>14.2f}{'new':>10}")
+			continue
+		change = current["best"] / previous["best"] - 1
+		flag = "  REGRESSION" if change > threshold else ""
+		print(f"{name:<28}{previous['best'] * 1000:>14.2f}{current['best'] * 1000:>14.2f}{change:>+10.1%}{flag}")
+		if flag:
+			regressions.append(name)
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Offline benchmark suite.")
+	parser.add_argument("--units", type=int, default=5000, help="Active apartments in the synthetic database.")
+	parser.add_argument("--archived", type=int, default=2000, help="Archived apartments in the synthetic database.")
+	parser.add_argument("--page-repeat", type=int, default=10, help="Multiply the fixture rows to simulate a larger page.")
+	parser.add_argument("--rounds", type=int, default=5)
+	parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only these cases (repeatable).")
+	parser.add_argument("--output", default=RESULTS_JSON)
+	parser.add_argument("--baseline", default=BASELINE_JSON)
+	parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline instead of comparing.")
+	parser.add_argument("--threshold", type=float, default=0.25, help="Relative slowdown that counts as a regression.")
+	args = parser.parse_args()
+	output, baseline_path = os.path.abspath(args.output), os.path.abspath(args.baseline)
+
+	# api resolves the layout JSON and templates relative to the working directory.
+	os.chdir(ROOT_DIR)
+	results = {}
+	with tempfile.TemporaryDirectory(prefix="apartments-bench-") as workdir:
+		context = Context(args.units, args.archived, args.page_repeat, workdir)
+		for name in args.only or BENCHMARKS:
+			case = BENCHMARKS[name](context)
+			if case is None:
+				print(f"{name:<28}{'skipped':>10}")
+				continue
+			run, operations, setup, *extra = case
+			result = measure(run, args.rounds, setup)
+			result.update(*extra)
+			result["operations"] = operations
+			result["ops_per_second"] = round(operations / result["best"], 1) if result["best"] else None
+			results[name] = result
+			print(f"{name:<28}{result['best'] * 1000:>10.2f} ms best {result['median'] * 1000:>10.2f} ms median  ({operations} ops)")
+		context.app.config["DATABASE"] = context.main_db
+
+	report = {
+		"meta": {
+			"timestamp": time(),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"sqlite": sqlite3.sqlite_version,
+			"units": args.units,
+			"archived": args.archived,
+			"page_repeat": args.page_repeat,
+			"rounds": args.rounds,
+		},
+		"results": results,
+	}
+	target = baseline_path if args.save_baseline else output
+	os.makedirs(os.path.dirname(target), exist_ok=True)
+	with open(target, "w", encoding="utf8") as file:
+		json.dump(report, file, indent=2)
+	print(f"\nWrote {target}.")
+	if args.save_baseline:
+		return
+
+	if not os.path.exists(baseline_path):
+		print(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
+		return
+	with open(baseline_path, "r", encoding="utf8") as file:
+		baseline = json.load(file)
+	if baseline["meta"].get("units") != args.units or baseline["meta"].get("page_repeat") != args.page_repeat:
+		print("Warning: baseline was recorded with different --units/--page-repeat; comparisons are not like for like.")
+	regressions = compare(results, baseline["results"], args.threshold)
+	if regressions:
+		print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
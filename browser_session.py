@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# filename          : browser_session.py
+# description       : Persistent Chrome profiles and a cookie jar shared with HttpEngine
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Chrome locks its user-data-dir, so each concurrently running
+#                     browser claims its own numbered profile under the session
+#                     directory, holding an OS lock on profile-N.lock so browsers
+#                     in other server processes skip it; the OS drops the lock
+#                     if the process dies. After Chrome gets past a challenge
+#                     its cookies and user agent are saved to cookies.json, and
+#                     HttpEngine sends them so the browser-free fetch is
+#                     challenged less often.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import json
+import logging
+import threading
+from time import time
+from typing import IO
+from urllib.parse import urlsplit
+
+try:
+	import fcntl
+except ImportError:  # Windows
+	fcntl = None
+	import msvcrt
+
+
+SESSION_DIR = os.path.abspath(os.environ.get("CHROME_PROFILE_DIR", "selenium_data"))
+
+# Slot -> the open lock file that holds it.
+_claimed_profiles: dict[int, IO] = {}
+_profiles_lock = threading.Lock()
+
+
+def _try_lock(lock_path: str) -> IO | None:
+	"""Opens and exclusively locks `lock_path` without waiting. Returns the open file, or None if it is locked."""
+	file = open(lock_path, "a+")
+	try:
+		if fcntl is not None:
+			fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+		else:
+			file.seek(0)
+			msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+	except OSError:
+		file.close()
+		return None
+	return file
+
+
+def claim_profile(directory: str = SESSION_DIR) -> tuple[int, str]:
+	"""Claims the lowest-numbered profile no other browser, in any process, is using. Returns its slot and path."""
+	os.makedirs(directory, exist_ok=True)
+	with _profiles_lock:
+		slot = 0
+		while True:
+			if slot not in _claimed_profiles:
+				lock = _try_lock(os.path.join(directory, f"profile-{slot}.lock"))
+				if lock is not None:
+					_claimed_profiles[slot] = lock
+					break
+			slot += 1
+	path = os.path.join(directory, f"profile-{slot}")
+	os.makedirs(path, exist_ok=True)
+	return slot, path
+
+
+def release_profile(slot: int):
+	with _profiles_lock:
+		lock = _claimed_profiles.pop(slot, None)
+	if lock is not None:
+		# Closing the file releases the lock.
+		lock.close()
+
+
+class SessionStore:
+	def __init__(self, directory: str = SESSION_DIR):
+		self.path = os.path.join(directory, "cookies.json")
+		self._lock = threading.Lock()
+		self._cache: tuple[float, dict] | None = None
+
+	def save(self, cookies: list[dict], user_agent: str):
+		"""Replaces the jar with cookies in Selenium's get_cookies() format."""
+		os.makedirs(os.path.dirname(self.path), exist_ok=True)
+		session = {"saved_at": time(), "user_agent": user_agent, "cookies": cookies}
+		temporary = f"{self.path}.{os.getpid()}.tmp"
+		with self._lock:
+			with open(temporary, "w", encoding="utf8") as file:
+				json.dump(session, file)
+			os.replace(temporary, self.path)
+		logging.info(f"Saved {len(cookies)} browser cookie(s) to {self.path}.")
+
+	def load(self) -> dict:
+		"""The saved session, re-read only when the file has changed; empty when there is none."""
+		try:
+			mtime = os.path.getmtime(self.path)
+		except OSError:
+			return {}
+		with self._lock:
+			if self._cache is None or self._cache[0] != mtime:
+				try:
+					with open(self.path, "r", encoding="utf8") as file:
+						self._cache = (mtime, json.load(file))
+				except (OSError, ValueError) as e:
+					logging.warning(f"Ignoring unreadable cookie jar {self.path}: {e}")
+					return {}
+			return self._cache[1]
+
+	@property
+	def user_agent(self) -> str | None:
+		return self.load().get("user_agent")
+
+	def cookie_header(self, url: str) -> str | None:
+		"""The Cookie header value for `url` from the saved cookies, skipping expired and non-matching ones."""
+		parts = urlsplit(url)
+		host, path, now = parts.hostname or "", parts.path or "/", time()
+		pairs = []
+		for cookie in self.load().get("cookies", []):
+			domain = cookie.get("domain", "").lstrip(".")
+			if not (host == domain or host.endswith(f".{domain}")):
+				continue
+			if not path.startswith(cookie.get("path", "/")):
+				continue
+			if cookie.get("secure") and parts.scheme != "https":
+				continue
+			if cookie.get("expiry") is not None and cookie["expiry"] <= now:
+				continue
+			pairs.append(f"{cookie['name']}={cookie['value']}")
+		return "; ".join(pairs) or None
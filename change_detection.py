@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# filename          : change_detection.py
+# description       : Skips or narrows the DB sync when a scrape has not changed
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Each search target keeps a digest of its last synced rows.
+#                     A full sync still runs at least once per history checkpoint
+#                     so availability checkpoints and any drift get picked up.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import json
+import logging
+import hashlib
+import sqlite3
+from time import time
+
+from database import get_db
+from result import Result
+from history import CHECKPOINT_SECONDS
+from scrape_targets import merge_results
+
+
+def row_hash(result: Result) -> str:
+	"""Hashes every field a sync compares, so equal hashes mean nothing to write."""
+	row = [result.name, result.floor, result.style, result.page_url, result.price, result.details]
+	return hashlib.sha1(json.dumps(row, separators=(",", ":")).encode()).hexdigest()
+
+
+def target_fingerprint(row_hashes: dict[str, str]) -> str:
+	"""Order-independent digest of a target's rows."""
+	digest = hashlib.sha1()
+	for name in sorted(row_hashes):
+		digest.update(f"{name}\0{row_hashes[name]}\n".encode())
+	return digest.hexdigest()
+
+
+def load_fingerprints(db: sqlite3.Connection) -> dict[str, dict]:
+	return {
+		row["target"]: {
+			"fingerprint": row["fingerprint"],
+			"row_hashes": json.loads(row["row_hashes"]),
+			"full_synced_at": row["full_synced_at"],
+		}
+		for row in db.execute("SELECT target, fingerprint, row_hashes, full_synced_at FROM scrape_fingerprints")
+	}
+
+
+def save_fingerprints(db: sqlite3.Connection, hashes_by_url: dict[str, dict[str, str]], full_synced_at: dict[str, float]):
+	"""Replaces the stored fingerprints with the given targets, dropping any others."""
+	now = time()
+	with db:
+		db.execute("DELETE FROM scrape_fingerprints")
+		db.executemany(
+			"INSERT INTO scrape_fingerprints (target, fingerprint, row_hashes, updated_at, full_synced_at) VALUES (?, ?, ?, ?, ?)",
+			[
+				(url, target_fingerprint(hashes), json.dumps(hashes, sort_keys=True), now, full_synced_at[url])
+				for url, hashes in hashes_by_url.items()
+			],
+		)
+
+
+def clear_fingerprints(db: sqlite3.Connection):
+	"""Forgets every stored fingerprint, so the next complete scrape is synced in full."""
+	with db:
+		db.execute("DELETE FROM scrape_fingerprints")
+
+
+def _merged_hashes(hashes_by_url: dict[str, dict[str, str]]) -> dict[str, str]:
+	"""Per-name hashes with the same first-target-wins rule as merge_results."""
+	merged: dict[str, str] = {}
+	for hashes in hashes_by_url.values():
+		for name, digest in hashes.items():
+			merged.setdefault(name, digest)
+	return merged
+
+
+def sync_targets(results_by_url: dict[str, list[Result]], failed_targets: list[str]) -> dict:
+	"""
+	Syncs a multi-target scrape, doing as little DB work as the fingerprints allow:
+	nothing when every target is unchanged, only the changed and vanished rows when
+	some are, and a full sync_all when fingerprints are missing, stale or the target
+	set has changed. Returns the sync counts plus a `mode` of skipped/changes/full.
+	"""
+	merged = merge_results(results_by_url)
+	if failed_targets:
+		# Fingerprints describe complete scrapes only; a partial one is synced in full without archiving.
+		counts = Result.sync_all(merged, archive_missing=False)
+		# The rows no longer match the stored fingerprints, so a complete scrape that matches
+		# them again must not be skipped: it has to overwrite what this partial run wrote.
+		clear_fingerprints(get_db())
+		return dict(counts, mode="full")
+
+	db = get_db()
+	now = time()
+	hashes_by_url = {
+		url: {result.name: row_hash(result) for result in results}
+		for url, results in results_by_url.items()
+	}
+	stored = load_fingerprints(db)
+	stale = (
+		stored.keys() != hashes_by_url.keys()
+		or not stored
+		or now - min(entry["full_synced_at"] for entry in stored.values()) >= CHECKPOINT_SECONDS
+	)
+	if stale:
+		counts = Result.sync_all(merged)
+		save_fingerprints(db, hashes_by_url, dict.fromkeys(hashes_by_url, now))
+		return dict(counts, mode="full")
+
+	full_synced_at = {url: entry["full_synced_at"] for url, entry in stored.items()}
+	if all(stored[url]["fingerprint"] == target_fingerprint(hashes) for url, hashes in hashes_by_url.items()):
+		logging.info(f"All {len(hashes_by_url)} search targets unchanged; skipping sync.")
+		return {"inserted": 0, "updated": 0, "archived": 0, "relisted": 0, "unchanged": len(merged), "observed": 0, "mode": "skipped"}
+
+	previous = _merged_hashes({url: entry["row_hashes"] for url, entry in stored.items()})
+	current = _merged_hashes(hashes_by_url)
+	changed = [result for result in merged if previous.get(result.name) != current[result.name]]
+	removed = previous.keys() - current.keys()
+	logging.info(f"Fingerprint diff: {len(changed)} changed, {len(removed)} removed, {len(merged) - len(changed)} unchanged.")
+	counts = Result.sync_changes(changed, removed, unchanged=len(merged) - len(changed))
+	save_fingerprints(db, hashes_by_url, full_synced_at)
+	return dict(counts, mode="changes")
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# filename          : change_feed.py
+# description       : Wakes long-poll and server-sent-event clients when a sync lands
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Waiters are woken in-process by publish() and also re-check
+#                     the database every poll_interval, so syncs run by another
+#                     process are picked up too.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import json
+import threading
+from time import monotonic
+from collections.abc import Callable
+
+
+class ChangeNotifier:
+	def __init__(self, max_subscribers: int = 16, poll_interval: float = 5.0):
+		self.max_subscribers = max_subscribers
+		self.poll_interval = poll_interval
+		self._condition = threading.Condition()
+		self._version = 0
+		self._subscribers = 0
+
+	def publish(self, version: int):
+		"""Records a new data version and wakes every waiter."""
+		with self._condition:
+			self._version = max(self._version, version)
+			self._condition.notify_all()
+
+	def wait(self, after: int, timeout: float, current_version: Callable[[], int]) -> int:
+		"""Blocks until the data version exceeds `after` or `timeout` passes. Returns the latest version."""
+		deadline = monotonic() + timeout
+		version = current_version()
+		while version <= after:
+			remaining = deadline - monotonic()
+			if remaining <= 0:
+				break
+			with self._condition:
+				self._condition.wait_for(lambda: self._version > after, min(remaining, self.poll_interval))
+			version = current_version()
+		return version
+
+	def try_subscribe(self) -> bool:
+		"""Claims one of the long-lived stream slots; each holds a server thread while open."""
+		with self._condition:
+			if self._subscribers >= self.max_subscribers:
+				return False
+			self._subscribers += 1
+			return True
+
+	def unsubscribe(self):
+		with self._condition:
+			self._subscribers -= 1
+
+	@property
+	def subscribers(self) -> int:
+		return self._subscribers
+
+
+def sse_event(data: str, event: str | None = None, event_id: int | None = None) -> str:
+	"""Formats one server-sent event; `data` must not contain newlines."""
+	lines = []
+	if event_id is not None:
+		lines.append(f"id: {event_id}")
+	if event:
+		lines.append(f"event: {event}")
+	lines.append(f"data: {data}")
+	return "\n".join(lines) + "\n\n"
+
+
+def sse_comment(text: str = "keepalive") -> str:
+	return f": {text}\n\n"
+
+
+def changes_payload(version: int, since: int, upserted: list[str], archived: list[str], reset: bool = False) -> str:
+	"""The body shared by the changes endpoint and its stream: pre-serialized row objects joined into one document."""
+	return (
+		f'{{"version":{version},"since":{since},"reset":{json.dumps(reset)},'
+		f'"upserted":[{",".join(upserted)}],"archived":[{",".join(archived)}]}}'
+	)
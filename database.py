@@ -3,47 +3,136 @@
 # description       : Database connection and initialization helper
 # author            : Rico & Gemini
 # email             : rico@rico.cx
-# date              : 07-01-2025 # Updated date
-# version           : v2.0 # Updated version
+# date              : 10-18-2026 # Updated date
+# version           : v2.1 # Updated version
 # usage             : This file should not be run directly.
-# notes             : Updated to use Flask's application context for DB connection management.
+# notes             : Connections come from a WAL-tuned pool shared by all app contexts.
 # license           : MIT
 # py version        : 3.10+
 #==============================================================================
+import os
+import queue
 import sqlite3
+import threading
 import click
 from flask import current_app, g
 
+from migrations import migrate, SCHEMA_VERSION
+
+DEFAULT_DATABASE = os.environ.get("APARTMENTS_DATABASE", "database.db")
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+# Applied to every new connection. WAL lets waitress readers keep going while
+# the scheduler writes; NORMAL sync is durable in WAL mode apart from the last
+# transaction on power loss, which the next scrape rewrites anyway.
+DEFAULT_PRAGMAS = {
+	"journal_mode": "WAL",
+	"synchronous": "NORMAL",
+	"cache_size": -16000,  # KiB, i.e. 16 MB per connection
+	"mmap_size": 128 * 1024 * 1024,
+	"temp_store": "MEMORY",
+	"busy_timeout": 5000,  # ms a writer waits for another writer
+}
+
+
+class ConnectionManager:
+	"""
+	A small pool of tuned SQLite connections for one database file. Idle
+	connections are reused by whichever thread asks next instead of paying
+	connection setup on every request.
+	"""
+	def __init__(self, path: str = DEFAULT_DATABASE, pragmas: dict | None = None, max_idle: int = 4):
+		self.path = path
+		self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+		self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=max_idle)
+
+	def connect(self) -> sqlite3.Connection:
+		"""Opens a new tuned connection that is not tracked by the pool."""
+		# check_same_thread=False: pooled connections move between waitress
+		# threads, but only one thread holds a given connection at a time.
+		db = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+		db.row_factory = sqlite3.Row
+		for pragma, value in self.pragmas.items():
+			db.execute(f"PRAGMA {pragma} = {value}")
+		return db
+
+	def acquire(self) -> sqlite3.Connection:
+		try:
+			return self._idle.get_nowait()
+		except queue.Empty:
+			return self.connect()
+
+	def release(self, db: sqlite3.Connection):
+		if db.in_transaction:
+			db.rollback()
+		try:
+			self._idle.put_nowait(db)
+		except queue.Full:
+			db.close()
+
+	def close(self):
+		while True:
+			try:
+				self._idle.get_nowait().close()
+			except queue.Empty:
+				return
+
+
+_managers: dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_manager(path: str | None = None) -> ConnectionManager:
+	"""Returns the shared ConnectionManager for `path` (default: the app's DATABASE setting)."""
+	if path is None:
+		path = current_app.config.get("DATABASE", DEFAULT_DATABASE)
+	with _managers_lock:
+		if path not in _managers:
+			config = current_app.config if current_app else {}
+			_managers[path] = ConnectionManager(path, config.get("SQLITE_PRAGMAS"), config.get("DATABASE_POOL_SIZE", 4))
+		return _managers[path]
+
+def reset_managers(close: bool = True):
+	"""
+	Forgets every shared pool so the next get_manager() opens fresh connections.
+	SQLite connections must not cross a fork: call this before forking, and with
+	close=False in the child, which drops inherited handles without touching them.
+	"""
+	with _managers_lock:
+		if close:
+			for manager in _managers.values():
+				manager.close()
+		_managers.clear()
+
 def get_db():
 	"""
 	Connect to the application's configured database. The connection
 	is unique for each request and will be reused if this is called again.
 	"""
 	if 'db' not in g:
-		g.db = sqlite3.connect(
-			"database.db",  # In a real app, this might come from current_app.config['DATABASE']
-			detect_types=sqlite3.PARSE_DECLTYPES
-		)
-		g.db.row_factory = sqlite3.Row
+		g.db = get_manager().acquire()
 	return g.db
 
 def close_db(e=None):
 	"""
-	If this request connected to the database, close the connection.
-	This function is registered to be called when the app context is torn down.
+	If this request connected to the database, hand the connection back to
+	the pool. This function is registered to be called when the app context
+	is torn down.
 	"""
 	db = g.pop('db', None)
 	if db is not None:
-		db.close()
+		get_manager().release(db)
 
 def init_db():
 	"""
-	Initializes the database using the schema.sql file.
+	Initializes the database using the schema.sql file, upgrading an
+	existing database first so the schema's indexes find their columns.
 	"""
 	db = get_db()
+	migrate(db)
 	# The schema now creates both 'apartments' and 'deleted_apartments' tables.
-	with open("schema.sql", "r", encoding="utf8") as f:
+	with open(SCHEMA_PATH, "r", encoding="utf8") as f:
 		db.executescript(f.read())
+	db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
 @click.command("init-db")
 def init_db_command():
@@ -54,12 +143,23 @@ def init_db_command():
 	init_db()
 	click.echo("Initialized the database.")
 
+@click.command("migrate-db")
+def migrate_db_command():
+	"""
+	Command-line function to upgrade an existing database in place.
+	Run with 'flask migrate-db'.
+	"""
+	version = migrate(get_db())
+	click.echo(f"Database is at schema version {version}.")
+
 def init_app(app):
 	"""
 	Register database functions with the Flask app. This is called from
 	the application factory.
 	"""
+	app.config.setdefault("DATABASE", DEFAULT_DATABASE)
 	# Tell Flask to call close_db when cleaning up after returning a response
 	app.teardown_appcontext(close_db)
 	# Add the new 'init-db' command to the 'flask' command
 	app.cli.add_command(init_db_command)
+	app.cli.add_command(migrate_db_command)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# filename          : driver_pool.py
+# description       : Long-lived pool of Chrome drivers shared across updates
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Drivers are health-checked on checkout and recycled after
+#                     max_uses checkouts or when a scrape raises.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import logging
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from collections.abc import Callable
+
+from scraper_tools import ScraperTools
+
+
+class DriverPool:
+	def __init__(self, size: int = 1, max_uses: int = 20, factory: Callable[[], ScraperTools] = ScraperTools):
+		self.size = size
+		self.max_uses = max_uses
+		self.factory = factory
+		self._idle: list[tuple[ScraperTools, int]] = []
+		self._in_use = 0
+		self._closed = False
+		self._condition = threading.Condition()
+		self._stats = {
+			"warm_acquires": 0,
+			"cold_acquires": 0,
+			"warm_seconds": 0.0,
+			"cold_seconds": 0.0,
+			"recycled": 0,
+			"unhealthy": 0,
+		}
+
+	@staticmethod
+	def is_healthy(browser: ScraperTools) -> bool:
+		try:
+			browser.current_url()
+			return True
+		except Exception:
+			return False
+
+	def _discard(self, browser: ScraperTools, reason: str):
+		logging.info(f"Recycling browser ({reason}).")
+		try:
+			browser.close()
+		except Exception as e:
+			logging.warning(f"Error closing recycled browser: {e}")
+
+	def _checkout(self, timeout: float | None) -> tuple[ScraperTools | None, int]:
+		with self._condition:
+			if not self._condition.wait_for(lambda: self._closed or self._idle or self._in_use < self.size, timeout):
+				raise TimeoutError(f"No browser available within {timeout}s.")
+			if self._closed:
+				raise RuntimeError("Driver pool is closed.")
+			self._in_use += 1
+			return self._idle.pop() if self._idle else (None, 0)
+
+	@contextmanager
+	def acquire(self, timeout: float | None = None):
+		"""Yields a started ScraperTools, reusing a warm one when possible."""
+		tic = perf_counter()
+		browser, uses = self._checkout(timeout)
+		try:
+			if browser is not None and not self.is_healthy(browser):
+				with self._condition:
+					self._stats["unhealthy"] += 1
+				self._discard(browser, "failed health check")
+				browser = None
+			warm = browser is not None
+			if not warm:
+				browser, uses = self.factory(), 0
+		except BaseException:
+			with self._condition:
+				self._in_use -= 1
+				self._condition.notify()
+			raise
+		elapsed = perf_counter() - tic
+		kind = "warm" if warm else "cold"
+		with self._condition:
+			self._stats[f"{kind}_acquires"] += 1
+			self._stats[f"{kind}_seconds"] += elapsed
+		logging.info(f"Acquired {kind} browser in {elapsed:.2f}s.")
+
+		failed = False
+		try:
+			yield browser
+		except BaseException:
+			failed = True
+			raise
+		finally:
+			uses += 1
+			keep = not failed and uses < self.max_uses and not self._closed
+			if not keep:
+				self._discard(browser, "scrape failed" if failed else f"{uses} uses")
+			with self._condition:
+				self._in_use -= 1
+				if keep:
+					self._idle.append((browser, uses))
+				else:
+					self._stats["recycled"] += 1
+				self._condition.notify()
+
+	def stats(self) -> dict:
+		with self._condition:
+			stats = dict(self._stats, idle=len(self._idle), in_use=self._in_use, size=self.size, max_uses=self.max_uses)
+		for kind in ("warm", "cold"):
+			count = stats[f"{kind}_acquires"]
+			stats[f"{kind}_avg_ms"] = round(stats.pop(f"{kind}_seconds") / count * 1000, 2) if count else None
+		return stats
+
+	def close(self):
+		with self._condition:
+			self._closed = True
+			idle, self._idle = self._idle, []
+			self._condition.notify_all()
+		for browser, _uses in idle:
+			self._discard(browser, "pool closed")
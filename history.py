@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# filename          : history.py
+# description       : Append-only price/availability history and trend queries
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : A unit is only observed again when its price or availability
+#                     changes, or once its last observation is a checkpoint old.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import sqlite3
+
+try:
+	from database import get_db
+except ImportError:
+	def get_db(): raise RuntimeError("get_db function not available")
+
+
+# Re-record unchanged units once a day so daily trends see every listed unit.
+CHECKPOINT_SECONDS = 24 * 60 * 60
+
+TREND_GROUPS = {"floor": "floor", "style": "COALESCE(style, 'Unknown')"}
+TREND_BUCKETS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+
+def record_observations(db: sqlite3.Connection, results: list, archived: list[tuple], observed_at: int) -> int:
+	"""
+	Appends observations for a scrape inside the caller's transaction.
+	`results` are the listed units and `archived` holds a (name, floor,
+	style, price) tuple per unit that just went unavailable. Returns the
+	number of rows written.
+	"""
+	last = {
+		row["name"]: row
+		for row in db.execute(
+			"""SELECT name, price, available, MAX(observed_at) AS observed_at
+			   FROM listing_observations GROUP BY name"""
+		)
+	}
+	rows = []
+	for result in results:
+		previous = last.get(result.name)
+		changed = previous is None or previous["price"] != result.price or not previous["available"]
+		checkpoint = not changed and observed_at - previous["observed_at"] >= CHECKPOINT_SECONDS
+		if changed or checkpoint:
+			rows.append((result.name, observed_at, result.price, 1, result.floor, result.style, int(checkpoint)))
+	for name, floor, style, price in archived:
+		previous = last.get(name)
+		if previous is None or previous["available"]:
+			rows.append((name, observed_at, price, 0, floor, style, 0))
+	db.executemany(
+		"""INSERT INTO listing_observations (name, observed_at, price, available, floor, style, checkpoint)
+		   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+		rows
+	)
+	return len(rows)
+
+
+def get_history(name: str) -> list[dict]:
+	"""Every observation of one unit, oldest first, with the change from the previous price."""
+	db = get_db()
+	rows = db.execute(
+		"""SELECT observed_at, price, available, checkpoint,
+		          price - LAG(price) OVER (ORDER BY observed_at) AS price_change
+		   FROM listing_observations WHERE name = ? ORDER BY observed_at ASC""",
+		(name,)
+	).fetchall()
+	return [dict(row) for row in rows]
+
+
+def get_price_trend(group_by: str = "floor", bucket: str = "day", since: float = 0) -> list[dict]:
+	"""
+	Per-period price statistics for listed units, grouped by floor or style.
+	Each unit counts once per period, at its last observed price.
+	"""
+	if group_by not in TREND_GROUPS or bucket not in TREND_BUCKETS:
+		raise ValueError(f"group_by must be one of {sorted(TREND_GROUPS)} and bucket one of {sorted(TREND_BUCKETS)}.")
+	period = f"strftime('{TREND_BUCKETS[bucket]}', observed_at, 'unixepoch')"
+	db = get_db()
+	rows = db.execute(
+		f"""WITH per_period AS (
+			SELECT name, price, {TREND_GROUPS[group_by]} AS grp, {period} AS period,
+			       ROW_NUMBER() OVER (PARTITION BY name, {period} ORDER BY observed_at DESC) AS rank
+			FROM listing_observations WHERE available = 1 AND observed_at >= ?
+		)
+		SELECT period, grp AS "group", COUNT(*) AS units, ROUND(AVG(price)) AS avg_price,
+		       MIN(price) AS min_price, MAX(price) AS max_price
+		FROM per_period WHERE rank = 1
+		GROUP BY period, grp ORDER BY period ASC, grp ASC""",
+		(since,)
+	).fetchall()
+	return [dict(row) for row in rows]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# filename          : http_engine.py
+# description       : Browser-free fetch backend for the scraper
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Raises ChallengeDetected so the caller can fall back to Chrome.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import re
+import gzip
+import zlib
+import urllib.error
+import urllib.request
+
+from browser_session import SessionStore
+
+
+CHALLENGE_TITLE = re.compile(rb"<title>\s*Just a moment\.\.\.\s*</title>", re.IGNORECASE)
+
+DEFAULT_HEADERS = {
+	"User-Agent": (
+		"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+		"(KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36"
+	),
+	"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+	"Accept-Language": "en-US,en;q=0.9",
+	"Accept-Encoding": "gzip, deflate",
+}
+
+
+class ChallengeDetected(Exception):
+	"""The site answered with an anti-bot challenge instead of the listing page."""
+
+
+class ChallengeError(Exception):
+	"""Chrome was challenged and the challenge did not clear before its deadline. Not worth retrying right away."""
+	def __init__(self, url: str, waited: float):
+		super().__init__(f"Challenge for {url} did not clear within {waited:.0f}s.")
+		self.url = url
+		self.waited = waited
+
+
+def is_challenge(body: bytes) -> bool:
+	return CHALLENGE_TITLE.search(body[:4096]) is not None
+
+
+def _decode_body(body: bytes, encoding: str | None) -> bytes:
+	if encoding == "gzip":
+		return gzip.decompress(body)
+	if encoding == "deflate":
+		return zlib.decompress(body)
+	return body
+
+
+class HttpEngine:
+	name = "http"
+
+	def __init__(self, timeout: float = 15, headers: dict | None = None, session: SessionStore | None = None):
+		self.timeout = timeout
+		self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+		# Cookies and user agent saved by Chrome after it passed a challenge.
+		self.session = session
+		# url -> bytes received for its last fetch, before decompression.
+		self.transferred: dict[str, int] = {}
+
+	def fetch(self, url: str, timeout: float | None = None) -> str:
+		"""Returns the page HTML, raising ChallengeDetected on a challenge page."""
+		request = urllib.request.Request(url, headers=self.request_headers(url))
+		timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+		try:
+			with urllib.request.urlopen(request, timeout=timeout) as response:
+				raw = response.read()
+				self.transferred[url] = len(raw)
+				body = _decode_body(raw, response.headers.get("Content-Encoding"))
+				charset = response.headers.get_content_charset() or "utf-8"
+		except urllib.error.HTTPError as exc:
+			# Challenge pages are usually served with a 403 or 503 status.
+			body = _decode_body(exc.read(), exc.headers.get("Content-Encoding"))
+			if is_challenge(body):
+				raise ChallengeDetected(url) from exc
+			raise
+		if is_challenge(body):
+			raise ChallengeDetected(url)
+		return body.decode(charset, errors="replace")
+
+	def request_headers(self, url: str) -> dict:
+		if self.session is None:
+			return self.headers
+		headers = dict(self.headers)
+		cookies = self.session.cookie_header(url)
+		if cookies:
+			# Challenge clearance cookies are tied to the browser's user agent.
+			headers["Cookie"] = cookies
+			headers["User-Agent"] = self.session.user_agent or headers["User-Agent"]
+		return headers
+
+	def close(self):
+		pass
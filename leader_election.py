@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# filename          : leader_election.py
+# description       : SQLite leases that pick one server process to run updates
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : A lease is a row in the leases table that expires unless its
+#                     holder renews it. Taking or renewing one is a single upsert,
+#                     so two processes can never both win. A holder that dies stops
+#                     renewing and another process takes over after the TTL.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import uuid
+import socket
+import logging
+import sqlite3
+import threading
+from time import time
+from contextlib import contextmanager
+from collections.abc import Callable
+
+from database import ConnectionManager
+
+
+class LeaseUnavailable(Exception):
+	"""Raised when another process holds the lease."""
+
+
+class Lease:
+	def __init__(self, database: str, name: str, ttl: float = 60, holder: str | None = None):
+		self.name = name
+		self.ttl = ttl
+		self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+		self._manager = ConnectionManager(database)
+
+	def try_acquire(self) -> bool:
+		"""Takes the lease if it is free or expired, or renews it if this holder has it. Returns whether it is held."""
+		now = time()
+		db = self._manager.connect()
+		try:
+			with db:
+				# DO UPDATE only applies while the lease is ours or has run out; otherwise nothing changes.
+				acquired = db.execute(
+					"""INSERT INTO leases (name, holder, acquired_at, expires_at) VALUES (?, ?, ?, ?)
+					   ON CONFLICT (name) DO UPDATE SET
+					       holder = excluded.holder,
+					       acquired_at = CASE WHEN leases.holder = excluded.holder THEN leases.acquired_at ELSE excluded.acquired_at END,
+					       expires_at = excluded.expires_at
+					   WHERE leases.holder = excluded.holder OR leases.expires_at <= excluded.acquired_at""",
+					(self.name, self.holder, now, now + self.ttl)
+				).rowcount
+		finally:
+			db.close()
+		return bool(acquired)
+
+	def release(self):
+		db = self._manager.connect()
+		try:
+			with db:
+				db.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+		finally:
+			db.close()
+
+	def current(self) -> dict | None:
+		"""The lease row, whoever holds it, or None when it has never been taken."""
+		db = self._manager.connect()
+		try:
+			row = db.execute("SELECT holder, acquired_at, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+		finally:
+			db.close()
+		return dict(row, expired=row["expires_at"] <= time()) if row else None
+
+	@contextmanager
+	def hold(self):
+		"""Holds the lease for the length of the block, renewing it in the background. Raises LeaseUnavailable if it is taken."""
+		if not self.try_acquire():
+			raise LeaseUnavailable(f"Lease '{self.name}' is held by another process.")
+		stop = threading.Event()
+
+		def renew():
+			while not stop.wait(self.ttl / 3):
+				try:
+					if not self.try_acquire():
+						logging.warning(f"Lost lease '{self.name}' while holding it.")
+				except sqlite3.Error as e:
+					logging.warning(f"Could not renew lease '{self.name}': {e}")
+
+		renewer = threading.Thread(target=renew, name=f"lease-{self.name}", daemon=True)
+		renewer.start()
+		try:
+			yield self
+		finally:
+			stop.set()
+			renewer.join()
+			self.release()
+
+
+class LeaderElector:
+	"""
+	Keeps trying to take `lease` in a background thread and calls `on_elected` /
+	`on_demoted` when this process gains or loses it. Every process runs one;
+	at most one of them is leader at a time.
+	"""
+	def __init__(self, lease: Lease, on_elected: Callable[[], object], on_demoted: Callable[[], object], interval: float | None = None):
+		self.lease = lease
+		self.on_elected = on_elected
+		self.on_demoted = on_demoted
+		self.interval = interval or lease.ttl / 3
+		self.is_leader = False
+		self._renewed_at = 0.0
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name=f"leader-{lease.name}", daemon=True)
+
+	def start(self):
+		"""Makes the first attempt right away, so a lone process is leader before this returns."""
+		self._heartbeat()
+		self._thread.start()
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			self._heartbeat()
+
+	def _heartbeat(self):
+		try:
+			held = self.lease.try_acquire()
+			if held:
+				self._renewed_at = time()
+		except sqlite3.Error as e:
+			# A busy database is not proof someone else leads; keep the role until the lease would have run out.
+			logging.warning(f"Lease '{self.lease.name}' heartbeat failed: {e}")
+			held = self.is_leader and time() - self._renewed_at < self.lease.ttl
+		if held and not self.is_leader:
+			self.is_leader = True
+			logging.info(f"{self.lease.holder} is now leader for '{self.lease.name}'.")
+			self.on_elected()
+		elif not held and self.is_leader:
+			self.is_leader = False
+			logging.warning(f"{self.lease.holder} is no longer leader for '{self.lease.name}'.")
+			self.on_demoted()
+
+	def stop(self):
+		"""Stops the heartbeat and hands the lease back so another process can take over at once."""
+		self._stop.set()
+		if self._thread.is_alive():
+			self._thread.join()
+		if self.is_leader:
+			self.is_leader = False
+			self.on_demoted()
+			try:
+				self.lease.release()
+			except sqlite3.Error as e:
+				logging.warning(f"Could not release lease '{self.lease.name}': {e}")
+
+	def to_dict(self) -> dict:
+		return {"holder": self.lease.holder, "is_leader": self.is_leader, "lease": self.lease.current()}
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# filename          : listing_parser.py
+# description       : Single-pass extraction of unit rows from a floorplan page
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Parses the page once and evaluates precompiled XPaths per row.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import lxml.etree
+import lxml.html
+
+from result import Result
+from metrics import PARSE_SECONDS
+
+
+# Also what Chrome waits for before the page counts as ready.
+UNIT_ROWS_XPATH = "//tr[contains(@class, 'unit-container')]"
+UNIT_ROWS = lxml.etree.XPath(UNIT_ROWS_XPATH)
+UNIT_NAME = lxml.etree.XPath(".//td[@class='td-card-name']/text()")
+UNIT_RENT = lxml.etree.XPath(".//td[@class='td-card-rent']/text()")
+UNIT_LINK = lxml.etree.XPath(".//td[@class='td-card-footer']/a/@href")
+UNIT_DETAILS = lxml.etree.XPath(".//td[@class='td-card-details']/ul/li/text()")
+
+
+def parse_document(html: str | bytes):
+	"""Parses a full page into an lxml tree."""
+	return lxml.html.fromstring(html)
+
+
+def parse_unit(row) -> dict:
+	"""Extracts the listing fields from a single `unit-container` row node."""
+	name = UNIT_NAME(row)[-1].strip()
+	price = UNIT_RENT(row)[-2].strip()
+	price = int(price.replace("$", "").replace(",", "")) if price else 0
+	page_url = UNIT_LINK(row)[0].strip()
+	details = [detail.strip("- ") for detail in UNIT_DETAILS(row)]
+	floor = details.pop(0)
+	style = details.pop(0) if len(details) > 1 else None
+	return {
+		"name": name,
+		"floor": floor,
+		"style": style,
+		"page_url": page_url,
+		"price": price,
+		"details": details,
+	}
+
+
+def parse_results(html: str | bytes, scraper_object: object | None = None) -> list[Result]:
+	"""Builds a Result for every unit row on the page from a single parse."""
+	with PARSE_SECONDS.time():
+		document = parse_document(html)
+		return [Result(scraper_object=scraper_object, **parse_unit(row)) for row in UNIT_ROWS(document)]
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# filename          : metrics.py
+# description       : In-process counters, gauges and histograms with Prometheus export
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Dependency-free subset of the Prometheus client API:
+#                     METRIC.labels(...).inc()/set()/observe(). Label children
+#                     are cached, so a hot-path observation is a dict lookup, a
+#                     bisect and two additions under a lock.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from contextlib import contextmanager
+from collections.abc import Callable
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = tuple(2 ** power for power in range(8, 24, 2))  # 256 B .. 4 MiB
+
+
+def _escape(value: str) -> str:
+	return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+	pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+	kind = ""
+
+	def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), registry: 'Registry | None' = None):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+		self._children: dict[tuple[str, ...], object] = {}
+		(REGISTRY if registry is None else registry).register(self)
+
+	def _new_child(self):
+		raise NotImplementedError
+
+	def labels(self, *values, **labels):
+		"""Returns the child for one label combination, creating it on first use."""
+		key = tuple(str(value) for value in values) or tuple(str(labels[name]) for name in self.labelnames)
+		child = self._children.get(key)
+		if child is None:
+			if len(key) != len(self.labelnames):
+				raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}.")
+			with self._lock:
+				child = self._children.setdefault(key, self._new_child())
+		return child
+
+	def _default(self):
+		if self.labelnames:
+			raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels().")
+		return self.labels()
+
+	def samples(self) -> list[tuple[str, str, float]]:
+		raise NotImplementedError
+
+	def render(self) -> str:
+		lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+		lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+		return "\n".join(lines)
+
+
+class _Value:
+	__slots__ = ("value", "_lock", "function")
+
+	def __init__(self):
+		self.value = 0.0
+		self._lock = threading.Lock()
+		self.function: Callable[[], float] | None = None
+
+	def inc(self, amount: float = 1):
+		with self._lock:
+			self.value += amount
+
+	def dec(self, amount: float = 1):
+		self.inc(-amount)
+
+	def set(self, value: float):
+		self.value = float(value)
+
+	def set_function(self, function: Callable[[], float]):
+		"""Reads the value from `function` at scrape time instead of storing it."""
+		self.function = function
+
+	def get(self) -> float:
+		return float(self.function()) if self.function is not None else self.value
+
+
+class Counter(Metric):
+	kind = "counter"
+
+	def _new_child(self):
+		return _Value()
+
+	def inc(self, amount: float = 1):
+		if amount < 0:
+			raise ValueError("Counters can only increase.")
+		self._default().inc(amount)
+
+	def samples(self):
+		return [(self.name, _format_labels(self.labelnames, key), child.get()) for key, child in sorted(self._children.items())]
+
+
+class Gauge(Counter):
+	kind = "gauge"
+
+	def inc(self, amount: float = 1):
+		self._default().inc(amount)
+
+	def dec(self, amount: float = 1):
+		self._default().dec(amount)
+
+	def set(self, value: float):
+		self._default().set(value)
+
+	def set_function(self, function: Callable[[], float]):
+		self._default().set_function(function)
+
+
+class _HistogramValue:
+	__slots__ = ("upper_bounds", "buckets", "sum", "count", "_lock")
+
+	def __init__(self, upper_bounds: tuple[float, ...]):
+		self.upper_bounds = upper_bounds
+		self.buckets = [0] * (len(upper_bounds) + 1)
+		self.sum = 0.0
+		self.count = 0
+		self._lock = threading.Lock()
+
+	def observe(self, value: float):
+		index = bisect_left(self.upper_bounds, value)
+		with self._lock:
+			self.buckets[index] += 1
+			self.sum += value
+			self.count += 1
+
+	@contextmanager
+	def time(self):
+		tic = perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(perf_counter() - tic)
+
+
+class Histogram(Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS,
+	             registry: 'Registry | None' = None):
+		self.upper_bounds = tuple(sorted(buckets))
+		super().__init__(name, documentation, labelnames, registry)
+
+	def _new_child(self):
+		return _HistogramValue(self.upper_bounds)
+
+	def observe(self, value: float):
+		self._default().observe(value)
+
+	def time(self):
+		return self._default().time()
+
+	def samples(self):
+		samples = []
+		for key, child in sorted(self._children.items()):
+			with child._lock:
+				buckets, total, count = list(child.buckets), child.sum, child.count
+			cumulative = 0
+			for upper_bound, bucket in zip(self.upper_bounds + (float("inf"),), buckets):
+				cumulative += bucket
+				labels = _format_labels(self.labelnames, key, f'le="{_format_value(upper_bound)}"')
+				samples.append((f"{self.name}_bucket", labels, cumulative))
+			labels = _format_labels(self.labelnames, key)
+			samples.append((f"{self.name}_sum", labels, total))
+			samples.append((f"{self.name}_count", labels, count))
+		return samples
+
+
+class Registry:
+	def __init__(self):
+		self._metrics: dict[str, Metric] = {}
+
+	def register(self, metric: Metric):
+		if metric.name in self._metrics:
+			raise ValueError(f"Metric {metric.name} is already registered.")
+		self._metrics[metric.name] = metric
+
+	def render(self) -> str:
+		"""Prometheus text exposition format (0.0.4) for every registered metric."""
+		return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+DRIVER_STARTUP_SECONDS = Histogram("apartments_driver_startup_seconds", "Time to start Xvfb and Chrome.")
+PAGE_LOAD_SECONDS = Histogram("apartments_page_load_seconds", "Time until a search page's unit rows are ready.", ("engine",))
+PAGE_BYTES = Histogram("apartments_page_bytes", "Bytes transferred to load a search page.", ("engine",), buckets=SIZE_BUCKETS)
+PARSE_SECONDS = Histogram("apartments_parse_seconds", "Time to parse a search page into results.")
+FUNCTION_SECONDS = Histogram("apartments_function_seconds", "Latency of functions wrapped with timer.timer.", ("function",))
+UPDATE_PHASE_SECONDS = Histogram("apartments_update_phase_seconds", "Duration of each update job phase.", ("phase",))
+UPDATE_JOBS = Counter("apartments_update_jobs_total", "Finished update jobs.", ("trigger", "state"))
+SYNC_ROWS = Counter("apartments_sync_rows_total", "Apartment rows handled by syncs.", ("action",))
+BROWSER_POOL_BROWSERS = Gauge("apartments_browser_pool_browsers", "Pooled browsers by state.", ("state",))
+SYNC_RUNS = Counter("apartments_sync_runs_total", "Syncs by mode (full, changes or skipped).", ("mode",))
+CHALLENGES = Counter("apartments_challenges_total", "Anti-bot challenges served, by engine and outcome (fallback, passed or failed).", ("engine", "outcome"))
+CHALLENGE_WAIT_SECONDS = Histogram("apartments_challenge_wait_seconds", "Time Chrome spent waiting out challenges.", ("outcome",))
+CHALLENGED_RUNS = Counter("apartments_challenged_runs_total", "Update runs that were served at least one challenge.")
+HTTP_REQUEST_SECONDS = Histogram("apartments_http_request_seconds", "API request latency.", ("method", "endpoint", "status"))
+HTTP_RESPONSE_BYTES = Histogram("apartments_http_response_bytes", "API response payload size.", ("endpoint",), buckets=SIZE_BUCKETS)
+
+
+def init_app(app):
+	"""Records latency and payload size for every request the app serves."""
+	from flask import g, request
+
+	@app.before_request
+	def start_request_timer():
+		g.metrics_tic = perf_counter()
+
+	@app.after_request
+	def record_request(response):
+		tic = g.pop("metrics_tic", None)
+		if tic is None:
+			return response
+		endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+		HTTP_REQUEST_SECONDS.labels(request.method, endpoint, response.status_code).observe(perf_counter() - tic)
+		# Streamed responses have no length until they are sent, so they are left out.
+		if not response.is_streamed:
+			HTTP_RESPONSE_BYTES.labels(endpoint).observe(response.calculate_content_length() or 0)
+		return response
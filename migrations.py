@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# filename          : migrations.py
+# description       : One-shot, versioned upgrades for existing databases
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Progress is tracked in PRAGMA user_version. Fresh databases
+#                     skip these steps because schema.sql is always current.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import ast
+import json
+import logging
+import sqlite3
+
+from apartment_query import building_for
+
+
+def decode_legacy_details(value: str | None) -> list[str]:
+	"""Decodes a details column written as JSON or as a Python str(list)."""
+	if not value:
+		return []
+	try:
+		details = json.loads(value)
+	except ValueError:
+		try:
+			details = ast.literal_eval(value)
+		except (ValueError, SyntaxError):
+			return []
+	return [str(detail) for detail in details] if isinstance(details, list) else []
+
+
+def _table_exists(db: sqlite3.Connection, table: str) -> bool:
+	return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _v1_details_as_json(db: sqlite3.Connection):
+	"""Rewrites str(list) details as JSON and builds the normalized feature tables."""
+	for table in ("apartments", "deleted_apartments"):
+		rows = db.execute(f"SELECT name, details FROM {table}").fetchall()
+		db.executemany(
+			f"UPDATE {table} SET details = ? WHERE name = ?",
+			[(json.dumps(decode_legacy_details(details)), name) for name, details in rows]
+		)
+	db.execute("CREATE TABLE IF NOT EXISTS features (id INTEGER PRIMARY KEY, label TEXT NOT NULL UNIQUE)")
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS apartment_features (
+			name TEXT NOT NULL,
+			feature_id INTEGER NOT NULL REFERENCES features (id),
+			PRIMARY KEY (name, feature_id)
+		) WITHOUT ROWID"""
+	)
+	db.execute("CREATE INDEX IF NOT EXISTS idx_apartment_features_feature ON apartment_features (feature_id, name)")
+	db.execute("INSERT OR IGNORE INTO features (label) SELECT DISTINCT j.value FROM apartments, json_each(apartments.details) AS j")
+	db.execute(
+		"""INSERT OR IGNORE INTO apartment_features (name, feature_id)
+		   SELECT apartments.name, features.id FROM apartments, json_each(apartments.details) AS j
+		   JOIN features ON features.label = j.value"""
+	)
+
+
+def _v2_listing_observations(db: sqlite3.Connection):
+	"""Adds the listing_observations history table, seeded from current rows."""
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS listing_observations (
+			id INTEGER PRIMARY KEY,
+			name TEXT NOT NULL,
+			observed_at REAL NOT NULL,
+			price INTEGER,
+			available INTEGER NOT NULL,
+			floor TEXT,
+			style TEXT,
+			checkpoint INTEGER NOT NULL DEFAULT 0
+		)"""
+	)
+	db.execute("CREATE INDEX IF NOT EXISTS idx_listing_observations_name_time ON listing_observations (name, observed_at)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_listing_observations_time ON listing_observations (observed_at)")
+	db.execute(
+		"""INSERT INTO listing_observations (name, observed_at, price, available, floor, style)
+		   SELECT name, updated_at, price, 1, floor, style FROM apartments"""
+	)
+	db.execute(
+		"""INSERT INTO listing_observations (name, observed_at, price, available, floor, style)
+		   SELECT name, updated_at, price, 1, floor, style FROM deleted_apartments
+		   UNION ALL
+		   SELECT name, deleted_at, price, 0, floor, style FROM deleted_apartments"""
+	)
+
+
+def _v3_sync_runs(db: sqlite3.Connection):
+	"""Adds the sync_runs table that versions the data for response caching."""
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS sync_runs (
+			version INTEGER PRIMARY KEY AUTOINCREMENT,
+			synced_at REAL NOT NULL,
+			inserted INTEGER NOT NULL,
+			updated INTEGER NOT NULL,
+			archived INTEGER NOT NULL
+		)"""
+	)
+
+
+def _v4_building_column(db: sqlite3.Connection):
+	"""Adds a derived building column and indexes for server-side filtering."""
+	for table in ("apartments", "deleted_apartments"):
+		db.execute(f"ALTER TABLE {table} ADD COLUMN building TEXT")
+		names = db.execute(f"SELECT name FROM {table}").fetchall()
+		db.executemany(f"UPDATE {table} SET building = ? WHERE name = ?", [(building_for(name), name) for name, in names])
+	db.execute("CREATE INDEX IF NOT EXISTS idx_apartments_building ON apartments (building)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_apartments_floor ON apartments (floor)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_apartments_style ON apartments (style)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_apartments_price ON apartments (price, name)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_deleted_apartments_deleted_at ON deleted_apartments (deleted_at, name)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_deleted_apartments_building ON deleted_apartments (building)")
+	db.execute("CREATE INDEX IF NOT EXISTS idx_deleted_apartments_price ON deleted_apartments (price, name)")
+
+
+def _v5_scrape_fingerprints(db: sqlite3.Connection):
+	"""Adds the scrape_fingerprints table used to skip syncing unchanged targets."""
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS scrape_fingerprints (
+			target TEXT PRIMARY KEY,
+			fingerprint TEXT NOT NULL,
+			row_hashes TEXT NOT NULL,
+			updated_at REAL NOT NULL,
+			full_synced_at REAL NOT NULL
+		)"""
+	)
+
+
+def _v6_sync_version_columns(db: sqlite3.Connection):
+	"""Tags apartment rows with the sync version that last wrote them, for delta queries."""
+	for table in ("apartments", "deleted_apartments"):
+		db.execute(f"ALTER TABLE {table} ADD COLUMN sync_version INTEGER")
+		db.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sync_version ON {table} (sync_version)")
+
+
+def _v7_archive_episodes(db: sqlite3.Connection):
+	"""Rebuilds deleted_apartments to keep one row per vacancy episode and adds the retention tables."""
+	db.execute(
+		"""CREATE TABLE deleted_apartments_episodes (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			name TEXT NOT NULL,
+			floor TEXT NOT NULL,
+			style TEXT,
+			page_url TEXT NOT NULL,
+			price INTEGER NOT NULL,
+			details TEXT,
+			created_at REAL NOT NULL,
+			updated_at REAL NOT NULL,
+			deleted_at REAL NOT NULL,
+			building TEXT,
+			sync_version INTEGER,
+			relisted_at REAL
+		)"""
+	)
+	# Units that are listed again were relisted no earlier than their current listing began.
+	db.execute(
+		"""INSERT INTO deleted_apartments_episodes (name, floor, style, page_url, price, details, created_at, updated_at, deleted_at, building, sync_version, relisted_at)
+		   SELECT d.name, d.floor, d.style, d.page_url, d.price, d.details, d.created_at, d.updated_at, d.deleted_at, d.building, d.sync_version,
+		          CASE WHEN a.name IS NULL THEN NULL ELSE MAX(a.created_at, d.deleted_at) END
+		   FROM deleted_apartments d LEFT JOIN apartments a ON a.name = d.name
+		   ORDER BY d.deleted_at"""
+	)
+	db.execute("DROP TABLE deleted_apartments")
+	db.execute("ALTER TABLE deleted_apartments_episodes RENAME TO deleted_apartments")
+	db.execute("CREATE INDEX idx_deleted_apartments_deleted_at ON deleted_apartments (deleted_at, name)")
+	db.execute("CREATE INDEX idx_deleted_apartments_building ON deleted_apartments (building)")
+	db.execute("CREATE INDEX idx_deleted_apartments_price ON deleted_apartments (price, name)")
+	db.execute("CREATE INDEX idx_deleted_apartments_sync_version ON deleted_apartments (sync_version)")
+	db.execute("CREATE UNIQUE INDEX idx_deleted_apartments_open ON deleted_apartments (name) WHERE relisted_at IS NULL")
+	db.execute("CREATE INDEX idx_deleted_apartments_name ON deleted_apartments (name, deleted_at)")
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS archive_summaries (
+			period TEXT NOT NULL,
+			building TEXT NOT NULL,
+			floor TEXT NOT NULL,
+			style TEXT NOT NULL,
+			episodes INTEGER NOT NULL,
+			price_sum INTEGER NOT NULL,
+			price_min INTEGER NOT NULL,
+			price_max INTEGER NOT NULL,
+			listed_seconds_sum REAL NOT NULL,
+			PRIMARY KEY (period, building, floor, style)
+		) WITHOUT ROWID"""
+	)
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS maintenance_runs (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			ran_at REAL NOT NULL,
+			rolled_up INTEGER NOT NULL,
+			vacuumed INTEGER NOT NULL
+		)"""
+	)
+
+
+def _v8_leases(db: sqlite3.Connection):
+	"""Adds the leases table used to elect the process that runs scheduled updates."""
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS leases (
+			name TEXT PRIMARY KEY,
+			holder TEXT NOT NULL,
+			acquired_at REAL NOT NULL,
+			expires_at REAL NOT NULL
+		)"""
+	)
+
+
+def _v9_update_jobs(db: sqlite3.Connection):
+	"""Adds the update_jobs table so job status can be polled from any server process."""
+	db.execute(
+		"""CREATE TABLE IF NOT EXISTS update_jobs (
+			id TEXT PRIMARY KEY,
+			state TEXT NOT NULL,
+			submitted_at REAL NOT NULL,
+			status TEXT NOT NULL
+		)"""
+	)
+
+
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1.
+MIGRATIONS = [
+	_v1_details_as_json,
+	_v2_listing_observations,
+	_v3_sync_runs,
+	_v4_building_column,
+	_v5_scrape_fingerprints,
+	_v6_sync_version_columns,
+	_v7_archive_episodes,
+	_v8_leases,
+	_v9_update_jobs,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db: sqlite3.Connection) -> int:
+	"""Applies every pending step, each in its own transaction. Returns the resulting version."""
+	version = db.execute("PRAGMA user_version").fetchone()[0]
+	if not _table_exists(db, "apartments"):
+		return version
+	for step in MIGRATIONS[version:]:
+		logging.info(f"Migrating database to v{version + 1}: {step.__doc__}")
+		db.execute("BEGIN")
+		try:
+			step(db)
+			db.execute(f"PRAGMA user_version = {version + 1}")
+			db.commit()
+		except Exception:
+			db.rollback()
+			raise
+		version += 1
+	return version
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# filename          : profiling.py
+# description       : On-demand cProfile and sampling captures of updates and API requests
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Nothing is profiled until a capture is armed, and the request
+#                     hooks are only installed when profiling is enabled. Captures
+#                     are written to a directory that keeps the newest `keep` files.
+#                     cProfile files download as pstats or as collapsed stacks
+#                     estimated from the caller graph; sampled captures are
+#                     collapsed stacks already (flamegraph.pl / speedscope input).
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import os
+import re
+import sys
+import pstats
+import cProfile
+import logging
+import threading
+from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager
+from collections.abc import Callable
+
+
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+MAX_STACK_DEPTH = 64
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(prof|collapsed)$")
+
+
+def _label(filename: str, lineno: int, name: str) -> str:
+	return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def _collapse_frame(frame) -> str:
+	names = []
+	while frame is not None and len(names) < MAX_STACK_DEPTH:
+		code = frame.f_code
+		names.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+		frame = frame.f_back
+	return ";".join(reversed(names))
+
+
+class Sampler:
+	"""Samples the stacks of the selected threads every `interval` seconds into collapsed-stack counts."""
+	def __init__(self, select: Callable[[threading.Thread], bool], interval: float = SAMPLE_INTERVAL):
+		self.select = select
+		self.interval = interval
+		self.counts: Counter[str] = Counter()
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+	def start(self):
+		self._thread.start()
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frames = sys._current_frames()
+			for thread in threading.enumerate():
+				if thread is not self._thread and thread.ident in frames and self.select(thread):
+					self.counts[f"{thread.name};{_collapse_frame(frames[thread.ident])}"] += 1
+
+	def stop(self):
+		self._stop.set()
+		self._thread.join()
+
+	def collapsed(self) -> str:
+		return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def pstats_to_collapsed(path: str, min_seconds: float = 1e-6) -> str:
+	"""
+	Collapsed stacks from a cProfile dump, in microseconds. cProfile only keeps
+	caller -> callee edges, so each function's own time is spread over its callers
+	in proportion to the time each edge accounts for: an estimate, not a trace.
+	"""
+	stats = pstats.Stats(path).stats
+	lines: Counter[str] = Counter()
+
+	def walk(function, seconds: float, stack: list[str], seen: set):
+		callers = stats.get(function, (0, 0, 0, 0, {}))[4]
+		total = sum(edge[3] for edge in callers.values())
+		if not callers or total <= 0 or len(stack) >= MAX_STACK_DEPTH or seconds < min_seconds:
+			lines[";".join(reversed(stack))] += seconds
+			return
+		for caller, edge in callers.items():
+			share = seconds * edge[3] / total
+			if caller in seen:
+				# Recursion: attribute the share here rather than looping.
+				lines[";".join(reversed(stack))] += share
+			else:
+				walk(caller, share, stack + [_label(*caller)], seen | {caller})
+
+	for function, (_cc, _nc, own_seconds, _ct, _callers) in stats.items():
+		if own_seconds > 0:
+			walk(function, own_seconds, [_label(*function)], {function})
+	return "".join(
+		f"{stack} {round(seconds * 1e6)}\n"
+		for stack, seconds in sorted(lines.items(), key=lambda item: -item[1])
+		if round(seconds * 1e6) > 0
+	)
+
+
+class Profiler:
+	def __init__(self, directory: str = "profiles", keep: int = 20):
+		self.directory = os.path.abspath(directory)
+		self.keep = keep
+		self._lock = threading.Lock()
+		# cProfile allows one active profiler per process on 3.12+, so captures never overlap.
+		self._capturing = threading.Lock()
+		self.update_mode: str | None = None
+		self.routes: dict[str, list] = {}  # url rule -> [remaining requests, mode]
+
+	@staticmethod
+	def _check_mode(mode: str):
+		if mode not in MODES:
+			raise ValueError(f"mode must be one of {', '.join(MODES)}.")
+
+	def arm_update(self, mode: str = "sample"):
+		"""Profiles the next update run. Sampling is the default because it also sees the scrape threads."""
+		self._check_mode(mode)
+		self.update_mode = mode
+
+	def arm_route(self, rule: str, count: int = 1, mode: str = "cprofile"):
+		"""Profiles the next `count` requests matched by the URL rule `rule`, e.g. /api/v1/apartments."""
+		self._check_mode(mode)
+		if count < 1:
+			raise ValueError("count must be at least 1.")
+		with self._lock:
+			self.routes[rule] = [count, mode]
+
+	def claim_update(self) -> str | None:
+		with self._lock:
+			mode, self.update_mode = self.update_mode, None
+		return mode
+
+	def claim_route(self, rule: str) -> str | None:
+		with self._lock:
+			armed = self.routes.get(rule)
+			if armed is None:
+				return None
+			armed[0] -= 1
+			if armed[0] <= 0:
+				del self.routes[rule]
+			return armed[1]
+
+	@contextmanager
+	def capture(self, kind: str, label: str, mode: str, select: Callable[[threading.Thread], bool] | None = None):
+		"""
+		Profiles the block and writes the result to the profile directory. `select`
+		picks the threads a sampling capture watches (default: the calling thread);
+		cProfile always covers the calling thread. Skipped if another capture is running.
+		"""
+		if not self._capturing.acquire(blocking=False):
+			logging.warning(f"Skipping {kind} profile of {label}: another capture is running.")
+			yield None
+			return
+		try:
+			if mode == "cprofile":
+				profiler = cProfile.Profile()
+				profiler.enable()
+			else:
+				ident = threading.get_ident()
+				profiler = Sampler(select or (lambda thread: thread.ident == ident))
+				profiler.start()
+			try:
+				yield profiler
+			finally:
+				if mode == "cprofile":
+					profiler.disable()
+				else:
+					profiler.stop()
+				self._save(kind, label, profiler)
+		finally:
+			self._capturing.release()
+
+	def _save(self, kind: str, label: str, profiler: cProfile.Profile | Sampler):
+		os.makedirs(self.directory, exist_ok=True)
+		slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "root"
+		extension = "prof" if isinstance(profiler, cProfile.Profile) else "collapsed"
+		path = os.path.join(self.directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{kind}-{slug}.{extension}")
+		if extension == "prof":
+			profiler.dump_stats(path)
+		else:
+			with open(path, "w", encoding="utf8") as file:
+				file.write(profiler.collapsed())
+		logging.info(f"Wrote {kind} profile {path}.")
+		self._rotate()
+
+	def _rotate(self):
+		for profile in self.list()[self.keep:]:
+			try:
+				os.remove(os.path.join(self.directory, profile["name"]))
+			except OSError:
+				pass
+
+	def list(self) -> list[dict]:
+		"""Saved captures, newest first."""
+		try:
+			names = [name for name in os.listdir(self.directory) if PROFILE_NAME.match(name)]
+		except FileNotFoundError:
+			return []
+		profiles = []
+		for name in sorted(names, reverse=True):
+			stat = os.stat(os.path.join(self.directory, name))
+			profiles.append({
+				"name": name,
+				"size": stat.st_size,
+				"created_at": stat.st_mtime,
+				"formats": ["pstats", "collapsed"] if name.endswith(".prof") else ["collapsed"],
+			})
+		return profiles
+
+	def path(self, name: str) -> str | None:
+		"""The file for a listed capture name, or None; names never resolve outside the directory."""
+		if not PROFILE_NAME.match(name):
+			return None
+		path = os.path.join(self.directory, name)
+		return path if os.path.isfile(path) else None
+
+	def to_dict(self) -> dict:
+		with self._lock:
+			routes = {rule: {"remaining": remaining, "mode": mode} for rule, (remaining, mode) in self.routes.items()}
+		return {"directory": self.directory, "keep": self.keep, "update": self.update_mode, "routes": routes}
+
+
+def init_app(app, profiler: Profiler):
+	"""Profiles requests to armed routes. Only call this when profiling is enabled."""
+	from flask import g, request
+
+	@app.before_request
+	def start_request_profile():
+		if not profiler.routes or request.url_rule is None:
+			return
+		mode = profiler.claim_route(request.url_rule.rule)
+		if mode:
+			capture = profiler.capture("request", f"{request.method} {request.url_rule.rule}", mode)
+			capture.__enter__()
+			g.profile_capture = capture
+
+	@app.teardown_request
+	def finish_request_profile(error=None):
+		# Streamed bodies are produced after this, so only the view itself is profiled.
+		capture = g.pop("profile_capture", None)
+		if capture is not None:
+			capture.__exit__(None, None, None)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# filename          : response_cache.py
+# description       : Versioned cache of pre-serialized, pre-compressed API responses
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Entries are keyed on endpoint + query string and tagged with
+#                     the data version; a sync that changes rows bumps the version.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from flask import Response, request
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_BYTES = 1024
+
+
+@dataclass
+class CachedResponse:
+	version: tuple
+	etag: str
+	last_modified: float | None
+	# Content-Encoding -> body; "identity" is always present.
+	bodies: dict[str, bytes] = field(default_factory=dict)
+
+	def etag_for(self, encoding: str) -> str:
+		return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+
+def build_entry(body: bytes, version: tuple, last_modified: float | None) -> CachedResponse:
+	entry = CachedResponse(version, hashlib.sha256(body).hexdigest()[:32], last_modified, {"identity": body})
+	if len(body) >= MIN_COMPRESS_BYTES:
+		entry.bodies["gzip"] = gzip.compress(body, compresslevel=6)
+		if brotli is not None:
+			entry.bodies["br"] = brotli.compress(body, quality=9)
+	return entry
+
+
+class ResponseCache:
+	def __init__(self, max_entries: int = 64):
+		self.max_entries = max_entries
+		self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def get_or_build(self, key: tuple, version: tuple, last_modified: float | None, build: Callable[[], bytes]) -> CachedResponse:
+		"""Returns the entry for `key` at `version`, serializing it with `build()` on a miss."""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry.version == version:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry
+			self.misses += 1
+		# Built outside the lock; two threads racing on the same miss both
+		# produce identical bytes, so the later store is harmless.
+		entry = build_entry(build(), version, last_modified)
+		with self._lock:
+			self._entries[key] = entry
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+		return entry
+
+	def invalidate(self):
+		with self._lock:
+			self._entries.clear()
+
+
+def cached_response(entry: CachedResponse, mimetype: str = "application/json") -> Response:
+	"""Serves `entry` for the current request, honoring If-None-Match, If-Modified-Since and Accept-Encoding."""
+	encoding = request.accept_encodings.best_match([name for name in ("br", "gzip") if name in entry.bodies] + ["identity"]) or "identity"
+	etag = entry.etag_for(encoding)
+
+	if request.if_none_match:
+		not_modified = any(request.if_none_match.contains(entry.etag_for(name)) for name in entry.bodies)
+	elif request.if_modified_since and entry.last_modified:
+		not_modified = request.if_modified_since.timestamp() >= int(entry.last_modified)
+	else:
+		not_modified = False
+
+	response = Response(status=304) if not_modified else Response(entry.bodies[encoding], mimetype=mimetype)
+	if not not_modified and encoding != "identity":
+		response.headers["Content-Encoding"] = encoding
+	response.set_etag(etag)
+	if entry.last_modified:
+		response.last_modified = int(entry.last_modified)
+	response.headers["Vary"] = "Accept-Encoding"
+	# Let browsers keep the body but revalidate it on every page load.
+	response.cache_control.no_cache = True
+	return response
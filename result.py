@@ -9,40 +9,93 @@
 # license           : MIT
 # py version        : 3.10+
 #==============================================================================
+import json
 import sqlite3
 from time import time
 from datetime import datetime
 import logging
+from operator import itemgetter
 
 try:
 	from database import get_db
 except ImportError:
 	logging.error("Failed to import get_db from database. Ensure database.py is accessible.")
 	def get_db(): raise RuntimeError("get_db function not available")
+from history import record_observations
+from apartment_query import ApartmentQuery, building_for
+from migrations import decode_legacy_details
 
 
-class Result(dict):
-	# __init__, __str__, sanitize remain the same...
-	def __init__(self, name: str, floor: str, style: str | None, page_url: str, price: int, details: list[str] | str, scraper_object: object | None = None, created_at: int | None = None, updated_at: int | None = None, **kwargs):
+def decode_details(details: str) -> list[str]:
+	"""Decodes the JSON details column, tolerating rows not yet migrated."""
+	try:
+		decoded = json.loads(details)
+	except ValueError:
+		return decode_legacy_details(details)
+	return decoded if isinstance(decoded, list) else []
+
+
+# Columns serialized for API responses, in order; building and deleted_at only when the row has them.
+JSON_FIELDS = ("name", "floor", "style", "page_url", "price", "details", "created_at", "updated_at")
+OPTIONAL_FIELDS = ("building", "deleted_at")
+_UNSET = object()
+
+
+def json_object_sql(deleted: bool = False) -> str:
+	"""SQLite expression that renders a row as the same JSON object sanitize() produces."""
+	fields = JSON_FIELDS + OPTIONAL_FIELDS if deleted else JSON_FIELDS + OPTIONAL_FIELDS[:1]
+	pairs = [
+		f"'{field}', CASE WHEN json_valid(details) THEN json(details) ELSE json_array() END" if field == "details" else f"'{field}', {field}"
+		for field in fields
+	]
+	return f"json_object({', '.join(pairs)})"
+
+
+class Result:
+	"""
+	One apartment listing. Slotted, so each row is a single small object; the
+	details column is kept as its stored JSON text until something reads it.
+	"""
+	__slots__ = ("name", "floor", "style", "page_url", "price", "_details", "created_at", "updated_at", "building", "deleted_at", "scraper_object")
+
+	def __init__(self, name: str, floor: str, style: str | None, page_url: str, price: int, details: list[str] | str, scraper_object: object | None = None, created_at: int | None = None, updated_at: int | None = None, building: str | None = _UNSET, deleted_at: int | None = _UNSET):
 		self.scraper_object = scraper_object
 		self.name = name
 		self.floor = floor
 		self.style = style
 		self.page_url = page_url
 		self.price = price
-		if isinstance(details, str):
-			try:
-				self.details = eval(details)
-				if not isinstance(self.details, list): self.details = []
-			except Exception: self.details = []
-		else:
-			self.details = details if isinstance(details, list) else []
+		self.details = details
 		self.created_at = created_at
 		self.updated_at = updated_at
-		for key, value in kwargs.items(): setattr(self, key, value)
-		temp_dict = self.__dict__.copy()
-		temp_dict.pop('scraper_object', None)
-		super().__init__(temp_dict)
+		if building is not _UNSET:
+			self.building = building
+		if deleted_at is not _UNSET:
+			self.deleted_at = deleted_at
+
+	@property
+	def details(self) -> list[str]:
+		if isinstance(self._details, str):
+			self._details = decode_details(self._details)
+		return self._details
+
+	@details.setter
+	def details(self, details: list[str] | str):
+		self._details = details if isinstance(details, (list, str)) else []
+
+	@classmethod
+	def from_row(cls, row: sqlite3.Row) -> 'Result':
+		"""Builds a Result straight from an apartments or deleted_apartments row."""
+		keys = row.keys()
+		return cls(
+			row["name"], row["floor"], row["style"], row["page_url"], row["price"], row["details"],
+			created_at=row["created_at"], updated_at=row["updated_at"],
+			building=row["building"] if "building" in keys else _UNSET,
+			deleted_at=row["deleted_at"] if "deleted_at" in keys else _UNSET,
+		)
+
+	def __repr__(self):
+		return f"Result(name={self.name!r}, floor={self.floor!r}, style={self.style!r}, price={self.price!r})"
 
 	def __str__(self):
 		created_str = datetime.fromtimestamp(self.created_at).strftime('%Y-%m-%d %H:%M:%S') if self.created_at else 'N/A'
@@ -51,30 +104,84 @@ class Result(dict):
 				f"Page URL: {self.page_url}\nPrice: ${self.price:,}\nDetails: {', '.join(self.details)}\n"
 				f"Created At: {created_str}\nUpdated At: {updated_str}\n" + ("-" * 40))
 
-	def sanitize(self):
-		clean_dict = self.__dict__.copy()
-		clean_dict.pop("scraper_object", None)
+	def sanitize(self) -> dict:
+		clean_dict = {field: getattr(self, field) for field in JSON_FIELDS}
+		for field in OPTIONAL_FIELDS:
+			value = getattr(self, field, _UNSET)
+			if value is not _UNSET:
+				clean_dict[field] = value
 		return clean_dict
 
+	def to_json(self) -> bytes:
+		return json.dumps(self.sanitize(), separators=(",", ":")).encode("utf-8")
+
 	@staticmethod
 	def get(name: str):
 		db = get_db()
 		result_row = db.execute("SELECT * FROM apartments WHERE name = ?", (name,)).fetchone()
 		if not result_row: return None
-		return Result(**dict(result_row))
+		return Result.from_row(result_row)
 
 	@staticmethod
-	def get_all() -> list['Result']:
-		db = get_db()
-		results_rows = db.execute("SELECT * FROM apartments ORDER BY name ASC").fetchall()
-		return [Result(**dict(row)) for row in results_rows] if results_rows else []
+	def get_all(features: list[str] | None = None) -> list['Result']:
+		"""Retrieves available apartments, optionally only those having every one of `features`."""
+		return list(Result.iter_search(ApartmentQuery(features=sorted(set(features or [])))))
 
 	@staticmethod
-	def get_all_deleted() -> list['Result']:
+	def get_all_deleted(features: list[str] | None = None) -> list['Result']:
 		"""Retrieves all records from the deleted_apartments table."""
-		db = get_db()
-		results_rows = db.execute("SELECT * FROM deleted_apartments ORDER BY deleted_at DESC").fetchall()
-		return [Result(**dict(row)) for row in results_rows] if results_rows else []
+		return list(Result.iter_search(ApartmentQuery(features=sorted(set(features or [])), sort="deleted-desc"), deleted=True))
+
+	@staticmethod
+	def iter_search(query: ApartmentQuery, deleted: bool = False):
+		"""Yields a Result per matching row as it is read from the cursor, for unpaginated queries."""
+		for row in query.execute(get_db(), "deleted_apartments" if deleted else "apartments"):
+			yield Result.from_row(row)
+
+	@staticmethod
+	def search(query: ApartmentQuery, deleted: bool = False) -> tuple[list['Result'], str | None]:
+		"""Runs a filtered, sorted and optionally paginated query. Returns the page and the next cursor."""
+		return query.run(get_db(), "deleted_apartments" if deleted else "apartments", row_factory=Result.from_row)
+
+	@staticmethod
+	def search_json(query: ApartmentQuery, deleted: bool = False) -> tuple[list[tuple[str, str]], str | None]:
+		"""
+		Like search(), but SQLite renders each row as its JSON object, so no Result
+		or dict is built. Returns (name, json) pairs and the next cursor.
+		"""
+		return query.run(
+			get_db(), "deleted_apartments" if deleted else "apartments",
+			select=f"name, {json_object_sql(deleted)} AS json", row_factory=itemgetter(0, 1),
+		)
+
+	@staticmethod
+	def iter_json(query: ApartmentQuery, deleted: bool = False, batch_size: int = 500):
+		"""
+		Returns a generator of lists of at most `batch_size` (name, json) pairs
+		straight off the cursor, for streaming unpaginated results without holding
+		them all. The query runs before this returns, so a bad sort or filter raises
+		QueryError here rather than after the response has started.
+		"""
+		cursor = query.execute(get_db(), "deleted_apartments" if deleted else "apartments", select=f"name, {json_object_sql(deleted)} AS json")
+
+		def batches():
+			try:
+				while batch := cursor.fetchmany(batch_size):
+					yield [(row[0], row[1]) for row in batch]
+			finally:
+				cursor.close()
+		return batches()
+
+	@staticmethod
+	def _replace_features(db: sqlite3.Connection, details_by_name: dict[str, list[str]]):
+		"""Rewrites the apartment_features rows of each apartment. The caller commits."""
+		db.executemany("DELETE FROM apartment_features WHERE name = ?", [(name,) for name in details_by_name])
+		labels = {label for details in details_by_name.values() for label in details}
+		db.executemany("INSERT OR IGNORE INTO features (label) VALUES (?)", [(label,) for label in labels])
+		db.executemany(
+			"INSERT OR IGNORE INTO apartment_features (name, feature_id) SELECT ?, id FROM features WHERE label = ?",
+			[(name, label) for name, details in details_by_name.items() for label in details]
+		)
 
 	@staticmethod
 	def create(name, floor, style, page_url, price, details):
@@ -82,9 +189,11 @@ class Result(dict):
 		db = get_db()
 		try:
 			db.execute(
-				"INSERT INTO apartments (name, floor, style, page_url, price, details, updated_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-				(name, floor, style, page_url, price, str(details), current_ts, current_ts)
+				"INSERT INTO apartments (name, floor, style, page_url, price, details, updated_at, created_at, building) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(name, floor, style, page_url, price, json.dumps(details), current_ts, current_ts, building_for(name))
 			)
+			db.execute("UPDATE deleted_apartments SET relisted_at = ? WHERE name = ? AND relisted_at IS NULL", (current_ts, name))
+			Result._replace_features(db, {name: details})
 			db.commit()
 			logging.info(f"Created apartment record: {name}")
 		except sqlite3.Error as e:
@@ -97,28 +206,154 @@ class Result(dict):
 		try:
 			# Start a transaction
 			with db:
-				# 1. Fetch the record to be deleted
-				apartment_to_move = db.execute("SELECT * FROM apartments WHERE name = ?", (name,)).fetchone()
+				# 1. Copy the record into the deleted_apartments table
+				moved = db.execute(
+					"""INSERT INTO deleted_apartments (name, floor, style, page_url, price, details, created_at, updated_at, deleted_at, building)
+					   SELECT name, floor, style, page_url, price, details, created_at, updated_at, ?, building FROM apartments WHERE name = ?""",
+					(int(time()), name)
+				).rowcount
 
-				if not apartment_to_move:
+				if not moved:
 					logging.warning(f"Attempted to move non-existent apartment: {name}")
 					return
 
-				# 2. Insert it into the deleted_apartments table
-				db.execute(
-					"""INSERT INTO deleted_apartments (name, floor, style, page_url, price, details, created_at, updated_at, deleted_at)
-					   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-					(*apartment_to_move, int(time()))
-				)
-
-				# 3. Delete it from the main apartments table
+				# 2. Delete it from the main apartments table
 				db.execute("DELETE FROM apartments WHERE name = ?", (name,))
+				db.execute("DELETE FROM apartment_features WHERE name = ?", (name,))
 			
 			logging.info(f"Moved unavailable apartment to deleted records: {name}")
 
 		except sqlite3.Error as e:
 			logging.error(f"Database error moving record for {name}: {e}")
 
+	@staticmethod
+	def _load_sync_rows(db: sqlite3.Connection, names: set[str] | None = None) -> dict[str, tuple]:
+		"""Loads the comparable fields of every apartment, or only of `names`."""
+		sql = "SELECT name, floor, style, page_url, price, details FROM apartments"
+		rows = db.execute(sql) if names is None else db.execute(f"{sql} WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(sorted(names)),))
+		return {row["name"]: (row["floor"], row["style"], row["page_url"], row["price"], row["details"]) for row in rows}
+
+	@staticmethod
+	def sync_all(results: list['Result'], archive_missing: bool = True) -> dict[str, int]:
+		"""
+		Syncs a full scrape against the apartments table: loads the table once,
+		diffs in memory and applies every insert, update and archive in a
+		single transaction. Returns the number of rows in each category.
+		"""
+		db = get_db()
+		existing = Result._load_sync_rows(db)
+		archived = sorted(existing.keys() - {result.name for result in results}) if archive_missing else []
+		return Result._apply_sync(db, results, existing, archived)
+
+	@staticmethod
+	def sync_changes(changed: list['Result'], removed: set[str], unchanged: int = 0) -> dict[str, int]:
+		"""
+		Fast-path sync for a scrape already diffed against the previous run:
+		only the `changed` rows are compared and written and only `removed`
+		names are archived. `unchanged` is carried into the returned counts.
+		"""
+		db = get_db()
+		existing = Result._load_sync_rows(db, {result.name for result in changed} | removed)
+		counts = Result._apply_sync(db, changed, existing, sorted(removed & existing.keys()))
+		counts["unchanged"] += unchanged
+		return counts
+
+	@staticmethod
+	def _apply_sync(db: sqlite3.Connection, results: list['Result'], existing: dict[str, tuple], archived: list[str]) -> dict[str, int]:
+		"""Diffs `results` against `existing` and writes the changes and archives in one transaction."""
+		current_ts = int(time())
+		inserts, updates = [], []
+		changed_details = {}
+		for result in results:
+			fields = (result.floor, result.style, result.page_url, result.price, json.dumps(result.details))
+			current = existing.get(result.name)
+			if current is None:
+				inserts.append((result.name, *fields, current_ts, current_ts, building_for(result.name)))
+			elif current != fields:
+				updates.append((*fields, current_ts, result.name))
+			else:
+				continue
+			changed_details[result.name] = result.details
+		archived_units = [(name, existing[name][0], existing[name][1], existing[name][3]) for name in archived]
+
+		try:
+			with db:
+				version = None
+				if inserts or updates or archived:
+					# The run is recorded first so every row it writes can carry its version.
+					version = db.execute(
+						"INSERT INTO sync_runs (synced_at, inserted, updated, archived) VALUES (?, ?, ?, ?)",
+						(current_ts, len(inserts), len(updates), len(archived))
+					).lastrowid
+				db.executemany(
+					"INSERT INTO apartments (name, floor, style, page_url, price, details, updated_at, created_at, building, sync_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+					[(*insert, version) for insert in inserts]
+				)
+				db.executemany(
+					"UPDATE apartments SET floor = ?, style = ?, page_url = ?, price = ?, details = ?, updated_at = ?, sync_version = ? WHERE name = ?",
+					[(*update[:-1], version, update[-1]) for update in updates]
+				)
+				# A unit that comes back closes its open vacancy episode; one that goes
+				# away opens a new one, so every episode is kept.
+				relisted = db.executemany(
+					"UPDATE deleted_apartments SET relisted_at = ? WHERE name = ? AND relisted_at IS NULL",
+					[(current_ts, insert[0]) for insert in inserts]
+				).rowcount if inserts else 0
+				db.executemany(
+					"""INSERT INTO deleted_apartments (name, floor, style, page_url, price, details, created_at, updated_at, deleted_at, building, sync_version)
+					   SELECT name, floor, style, page_url, price, details, created_at, updated_at, ?, building, ? FROM apartments WHERE name = ?""",
+					[(current_ts, version, name) for name in archived]
+				)
+				db.executemany("DELETE FROM apartments WHERE name = ?", [(name,) for name in archived])
+				db.executemany("DELETE FROM apartment_features WHERE name = ?", [(name,) for name in archived])
+				Result._replace_features(db, changed_details)
+				observed = record_observations(db, results, archived_units, current_ts)
+		except sqlite3.Error as e:
+			logging.error(f"Database error syncing {len(results)} results: {e}")
+			raise
+
+		return {"inserted": len(inserts), "updated": len(updates), "archived": len(archived), "relisted": relisted, "unchanged": len(results) - len(inserts) - len(updates), "observed": observed, "version": version}
+
+	@staticmethod
+	def data_version() -> tuple[int, float | None]:
+		"""Returns the latest sync version that changed data and when it ran."""
+		db = get_db()
+		row = db.execute("SELECT version, synced_at FROM sync_runs ORDER BY version DESC LIMIT 1").fetchone()
+		return (row["version"], row["synced_at"]) if row else (0, None)
+
+	@staticmethod
+	def get_episodes(name: str) -> list[dict]:
+		"""Every vacancy episode kept for a unit, oldest first."""
+		rows = get_db().execute(
+			"""SELECT id, price, created_at, deleted_at, relisted_at, deleted_at - created_at AS listed_seconds
+			   FROM deleted_apartments WHERE name = ? ORDER BY deleted_at""",
+			(name,)
+		)
+		return [dict(row) for row in rows]
+
+	@staticmethod
+	def version_at(timestamp: float) -> int:
+		"""The latest sync version that had run by `timestamp` (0 if none)."""
+		row = get_db().execute("SELECT MAX(version) FROM sync_runs WHERE synced_at <= ?", (timestamp,)).fetchone()
+		return row[0] or 0
+
+	@staticmethod
+	def changes_since(version: int) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+		"""
+		Rows written by syncs after `version`, rendered as JSON by SQLite: the
+		available apartments added or changed, and the apartments archived that
+		have not been relisted since. Both are lists of (name, json) pairs.
+		"""
+		db = get_db()
+		upserted = db.execute(
+			f"SELECT name, {json_object_sql()} FROM apartments WHERE sync_version > ? ORDER BY name", (version,)
+		).fetchall()
+		archived = db.execute(
+			f"SELECT name, {json_object_sql(deleted=True)} FROM deleted_apartments WHERE sync_version > ? AND relisted_at IS NULL ORDER BY name",
+			(version,)
+		).fetchall()
+		return [tuple(row) for row in upserted], [tuple(row) for row in archived]
+
 	def update(self):
 		current_ts = int(time())
 		db = get_db()
@@ -139,8 +374,9 @@ class Result(dict):
 		try:
 			db.execute(
 				"UPDATE apartments SET floor = ?, style = ?, page_url = ?, price = ?, details = ?, updated_at = ? WHERE name = ?",
-				(self.floor, self.style, self.page_url, self.price, str(self.details), current_ts, self.name)
+				(self.floor, self.style, self.page_url, self.price, json.dumps(self.details), current_ts, self.name)
 			)
+			self._replace_features(db, {self.name: self.details})
 			db.commit()
 			logging.info(f"Updated apartment record: {self.name}")
 		except sqlite3.Error as e:
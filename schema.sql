@@ -4,19 +4,129 @@ CREATE TABLE IF NOT EXISTS apartments (
 	style TEXT,
 	page_url TEXT NOT NULL,
 	price INTEGER NOT NULL,
-	details TEXT, -- Stored as a string representation of a list, e.g., "['Feature 1', 'Feature 2']"
+	details TEXT, -- JSON array, e.g., '["Feature 1", "Feature 2"]'
 	created_at REAL NOT NULL, -- Unix timestamp
-	updated_at REAL NOT NULL -- Unix timestamp
+	updated_at REAL NOT NULL, -- Unix timestamp
+	building TEXT, -- Derived from name at write time, e.g. '183' for '#183-119'
+	sync_version INTEGER -- sync_runs.version that last wrote the row
 );
 
+-- One row per vacancy episode: a unit's listing from created_at until it went
+-- unavailable at deleted_at. relisted_at is set when the unit comes back, so
+-- the open episodes (relisted_at IS NULL) are the units currently archived.
 CREATE TABLE IF NOT EXISTS deleted_apartments (
-	name TEXT PRIMARY KEY,
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	name TEXT NOT NULL,
 	floor TEXT NOT NULL,
 	style TEXT,
 	page_url TEXT NOT NULL,
 	price INTEGER NOT NULL,
-	details TEXT,
+	details TEXT, -- JSON array
 	created_at REAL NOT NULL,
 	updated_at REAL NOT NULL,
-	deleted_at REAL NOT NULL -- Unix timestamp when it was moved
+	deleted_at REAL NOT NULL, -- Unix timestamp when it was moved
+	building TEXT,
+	sync_version INTEGER, -- sync_runs.version that archived the row
+	relisted_at REAL -- Unix timestamp when the unit was listed again
+);
+
+-- Supporting indexes for the API's filter and sort arguments.
+CREATE INDEX IF NOT EXISTS idx_apartments_building ON apartments (building);
+CREATE INDEX IF NOT EXISTS idx_apartments_floor ON apartments (floor);
+CREATE INDEX IF NOT EXISTS idx_apartments_style ON apartments (style);
+CREATE INDEX IF NOT EXISTS idx_apartments_price ON apartments (price, name);
+CREATE INDEX IF NOT EXISTS idx_deleted_apartments_deleted_at ON deleted_apartments (deleted_at, name);
+CREATE INDEX IF NOT EXISTS idx_deleted_apartments_building ON deleted_apartments (building);
+CREATE INDEX IF NOT EXISTS idx_deleted_apartments_price ON deleted_apartments (price, name);
+CREATE INDEX IF NOT EXISTS idx_apartments_sync_version ON apartments (sync_version);
+CREATE INDEX IF NOT EXISTS idx_deleted_apartments_sync_version ON deleted_apartments (sync_version);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_deleted_apartments_open ON deleted_apartments (name) WHERE relisted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_deleted_apartments_name ON deleted_apartments (name, deleted_at);
+
+-- Normalized copy of the details of available apartments, for filtering in SQL.
+CREATE TABLE IF NOT EXISTS features (
+	id INTEGER PRIMARY KEY,
+	label TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS apartment_features (
+	name TEXT NOT NULL,
+	feature_id INTEGER NOT NULL REFERENCES features (id),
+	PRIMARY KEY (name, feature_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_apartment_features_feature ON apartment_features (feature_id, name);
+
+-- Append-only history: a row per price/availability change, plus a daily
+-- checkpoint for units that did not change.
+CREATE TABLE IF NOT EXISTS listing_observations (
+	id INTEGER PRIMARY KEY,
+	name TEXT NOT NULL,
+	observed_at REAL NOT NULL, -- Unix timestamp of the scrape
+	price INTEGER,
+	available INTEGER NOT NULL, -- 1 while listed, 0 once archived
+	floor TEXT,
+	style TEXT,
+	checkpoint INTEGER NOT NULL DEFAULT 0 -- 1 if recorded only because the last row was old
+);
+
+CREATE INDEX IF NOT EXISTS idx_listing_observations_name_time ON listing_observations (name, observed_at);
+CREATE INDEX IF NOT EXISTS idx_listing_observations_time ON listing_observations (observed_at);
+
+-- One row per sync that changed data. MAX(version) is the data version the
+-- API caches its responses against.
+CREATE TABLE IF NOT EXISTS sync_runs (
+	version INTEGER PRIMARY KEY AUTOINCREMENT,
+	synced_at REAL NOT NULL, -- Unix timestamp
+	inserted INTEGER NOT NULL,
+	updated INTEGER NOT NULL,
+	archived INTEGER NOT NULL
+);
+
+-- Vacancy episodes past the retention period, rolled up by month archived and unit type.
+-- Grouping columns use '' rather than NULL so they can form the primary key.
+CREATE TABLE IF NOT EXISTS archive_summaries (
+	period TEXT NOT NULL, -- 'YYYY-MM' of deleted_at
+	building TEXT NOT NULL,
+	floor TEXT NOT NULL,
+	style TEXT NOT NULL,
+	episodes INTEGER NOT NULL,
+	price_sum INTEGER NOT NULL,
+	price_min INTEGER NOT NULL,
+	price_max INTEGER NOT NULL,
+	listed_seconds_sum REAL NOT NULL, -- sum of deleted_at - created_at
+	PRIMARY KEY (period, building, floor, style)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS maintenance_runs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	ran_at REAL NOT NULL, -- Unix timestamp
+	rolled_up INTEGER NOT NULL, -- episodes moved into archive_summaries
+	vacuumed INTEGER NOT NULL -- 1 if VACUUM ran
+);
+
+-- Per-search-target digest of the last synced scrape, used to skip unchanged targets
+CREATE TABLE IF NOT EXISTS scrape_fingerprints (
+	target TEXT PRIMARY KEY, -- search URL
+	fingerprint TEXT NOT NULL, -- digest over the sorted row hashes
+	row_hashes TEXT NOT NULL, -- JSON object of apartment name -> row hash
+	updated_at REAL NOT NULL, -- Unix timestamp
+	full_synced_at REAL NOT NULL -- Unix timestamp of the last full table sync
+);
+
+-- Time-limited locks shared by every server process, e.g. which one runs the scheduler
+CREATE TABLE IF NOT EXISTS leases (
+	name TEXT PRIMARY KEY,
+	holder TEXT NOT NULL, -- host:pid:token of the owning process
+	acquired_at REAL NOT NULL, -- Unix timestamp
+	expires_at REAL NOT NULL -- Unix timestamp; free for anyone to take after this
+);
+
+-- The latest status of recent update jobs, so a job started by one server
+-- process can be polled through any of them.
+CREATE TABLE IF NOT EXISTS update_jobs (
+	id TEXT PRIMARY KEY,
+	state TEXT NOT NULL, -- queued, running, succeeded or failed
+	submitted_at REAL NOT NULL, -- Unix timestamp
+	status TEXT NOT NULL -- UpdateJob.to_dict() as JSON
 );
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# filename          : scrape_targets.py
+# description       : Concurrent fan-out over several search URLs
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Each target gets its own deadline and retry budget; results
+#                     are merged on apartment name in target order.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import logging
+import threading
+from time import monotonic
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from result import Result
+from http_engine import ChallengeError
+
+
+class ScrapeError(Exception):
+	"""Every search target failed, so there is nothing to sync."""
+
+
+def scrape_target(url: str, scrape_one: Callable[[str, float], list[Result]], timeout: float, retries: int, retry_delay: float) -> list[Result]:
+	"""Runs `scrape_one(url, remaining_seconds)` until it succeeds, retries run out or the deadline passes."""
+	deadline = monotonic() + timeout
+	for attempt in range(retries + 1):
+		remaining = deadline - monotonic()
+		if remaining <= 0:
+			raise TimeoutError(f"{url} did not finish within {timeout}s.")
+		try:
+			return scrape_one(url, remaining)
+		except ChallengeError:
+			# Hitting the challenge again straight away only makes it stick; leave it to the scheduler's backoff.
+			raise
+		except Exception as e:
+			if attempt == retries or deadline - monotonic() <= retry_delay:
+				raise
+			logging.warning(f"Attempt {attempt + 1} for {url} failed ({e}); retrying.")
+			threading.Event().wait(retry_delay * (attempt + 1))
+	raise AssertionError("unreachable")
+
+
+def merge_results(results_by_url: dict[str, list[Result]]) -> list[Result]:
+	"""Deduplicates results on name; the first target listing a unit wins."""
+	merged: dict[str, Result] = {}
+	for results in results_by_url.values():
+		for result in results:
+			merged.setdefault(result.name, result)
+	return list(merged.values())
+
+
+def scrape_targets(urls: list[str], scrape_one: Callable[[str, float], list[Result]], max_workers: int = 4,
+                   timeout: float = 60, retries: int = 1, retry_delay: float = 1.0) -> tuple[dict[str, list[Result]], list[str]]:
+	"""
+	Scrapes every URL on a bounded thread pool.
+	Returns the results of each successful URL, in URL order, and the URLs that failed.
+	"""
+	results_by_url: dict[str, list[Result]] = {}
+	failed_urls = []
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))), thread_name_prefix="scrape") as executor:
+		futures = [
+			(url, executor.submit(scrape_target, url, scrape_one, timeout, retries, retry_delay))
+			for url in urls
+		]
+		for url, future in futures:
+			try:
+				results_by_url[url] = future.result()
+			except Exception as e:
+				logging.error(f"Search target {url} failed: {e}")
+				failed_urls.append(url)
+	if urls and len(failed_urls) == len(urls):
+		raise ScrapeError(f"All {len(urls)} search targets failed.")
+	return results_by_url, failed_urls
@@ -10,76 +10,208 @@
 # license           : MIT
 # py version        : 3.13.1 (must run on 3.10 or higher)
 #==============================================================================
-from selenium.common.exceptions import NoSuchElementException, JavascriptException
+import logging
+import threading
+from time import perf_counter
+
+from selenium.common.exceptions import NoSuchElementException, JavascriptException, TimeoutException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
 
-from timer import timer
-from result import Result
-from element_find import find_elements_by_xpath
+from metrics import CHALLENGES, CHALLENGE_WAIT_SECONDS, PAGE_BYTES, PAGE_LOAD_SECONDS
+from driver_pool import DriverPool
+from browser_session import SessionStore
+from http_engine import HttpEngine, ChallengeDetected, ChallengeError
+from listing_parser import UNIT_ROWS_XPATH, parse_results
+from scrape_targets import scrape_targets, merge_results
 from scraper_tools import ScraperTools
 
 
+SEARCH_URLS = [
+	"https://www.villagesonmcknight.com/floorplans/highwood?Beds=1",
+]
+# How long Chrome waits for unit rows before treating the page as having none.
+ROWS_READY_TIMEOUT = 15
+# How long Chrome gives a challenge page to clear itself before the target fails.
+CHALLENGE_TIMEOUT = 30
+
+
 class Scraper(ScraperTools):
-	def __init__(self, init: bool = True):
+	def __init__(self, init: bool = True, engine: str = "http", pool: DriverPool | None = None,
+	             search_urls: list[str] | None = None, max_workers: int = 4, target_timeout: float = 120,
+	             retries: int = 1):
 		if not init:
 			return
-		super().__init__(init)
+		# Chrome is only started up front for the "chrome" engine without a
+		# pool; otherwise it is started or borrowed when it is first needed.
+		super().__init__(init=engine == "chrome" and pool is None)
+		self.session = SessionStore()
+		self.engine = HttpEngine(session=self.session) if engine == "http" else None
+		self.pool = pool
 		self.homepage_url = "https://www.villagesonmcknight.com/"
-		self.search_url = "https://www.villagesonmcknight.com/floorplans/highwood?Beds=1"
+		self.search_urls = list(search_urls or SEARCH_URLS)
+		self.search_url = self.search_urls[0]
+		self.max_workers = max_workers
+		self.target_timeout = target_timeout
+		self.retries = retries
+		self.failed_targets: list[str] = []
+		self.target_results: dict[str, list] = {}
+		# URLs served a challenge by either engine in the last run, and those it made fail.
+		self.challenged_targets: set[str] = set()
+		self.blocked_targets: set[str] = set()
+		# url -> seconds Chrome spent waiting on its challenge, for the last run.
+		self.challenge_waits: dict[str, float] = {}
+		# url -> engine, bytes transferred and seconds until the unit rows were ready, for the last run.
+		self.page_loads: dict[str, dict] = {}
+		self._browser_lock = threading.Lock()
 
-	# @timer
-	def open_link(self, url: str):
-		self.driver.get(url)
-
-	@property
-	def captcha(self) -> bool:
+	@staticmethod
+	def is_captcha(browser: ScraperTools) -> bool:
 		try:
-			return self.driver.find_element(By.XPATH, "/html/head/title").text == "Just a moment..."
+			return browser.driver.find_element(By.XPATH, "/html/head/title").text == "Just a moment..."
 		except NoSuchElementException:
 			print("Captcha not detected.")
 			return False
 
-	def close_modal(self):
+	@property
+	def captcha(self) -> bool:
+		return self.is_captcha(self)
+
+	def close_modal(self, browser: ScraperTools | None = None):
 		try:
-			self.run_script("ysi.nudge.closeNudge();")
+			(browser or self).run_script("ysi.nudge.closeNudge();")
 			print("Closed modal.")
 		except JavascriptException:
 			pass
 
 	def get_results(self):
-		self.open_link(self.search_url)
-		if self.captcha:
-			print("Captcha detected.")
-			input("Press Enter to continue...")
-		self.close_modal()
-
-		result_obj_list = []
-		results = self.find_elements_by_xpath("//tr[contains(@class, 'unit-container')]")
-		for result in results:
-			result = result.get_attribute("outerHTML")
-			name = find_elements_by_xpath(result, ".//td[@class='td-card-name']/text()")[-1].strip()
-			price = find_elements_by_xpath(result, ".//td[@class='td-card-rent']/text()")[-2].strip()
-			price = int(price.replace("$", "").replace(",", "")) if price else 0
-			page_url = find_elements_by_xpath(result, ".//td[@class='td-card-footer']/a/@href")[0].strip()
-			details = find_elements_by_xpath(result, ".//td[@class='td-card-details']/ul/li/text()")
-			details = [detail.strip("- ") for detail in details]
-			floor = details[0]
-			details.pop(0)
-			if len(details) > 1:
-				style = details[0]
-				details.pop(0)
-			else:
-				style = None
-			result = Result(scraper_object=self,
-			                name=name,
-			                floor=floor,
-			                style=style,
-			                page_url=page_url,
-			                price=price,
-			                details=details)
-			result_obj_list.append(result)
-		return result_obj_list
+		"""
+		Scrapes every search URL concurrently and returns the merged results.
+		Per-URL results are kept in `target_results` and failed URLs in `failed_targets`.
+		"""
+		self.page_loads = {}
+		self.challenged_targets = set()
+		self.blocked_targets = set()
+		self.challenge_waits = {}
+		self.target_results, self.failed_targets = scrape_targets(
+			self.search_urls,
+			self.get_target_results,
+			max_workers=self.max_workers,
+			timeout=self.target_timeout,
+			retries=self.retries,
+		)
+		return merge_results(self.target_results)
+
+	def get_target_results(self, url: str, timeout: float):
+		deadline = perf_counter() + timeout
+		if self.engine is not None:
+			try:
+				tic = perf_counter()
+				html = self.engine.fetch(url, timeout=timeout)
+				self.record_page_load(url, self.engine.name, self.engine.transferred.get(url, 0), perf_counter() - tic)
+				return parse_results(html, scraper_object=self)
+			except ChallengeDetected:
+				self.challenged_targets.add(url)
+				CHALLENGES.labels(engine=self.engine.name, outcome="fallback").inc()
+				logging.warning(f"Challenge served to {self.engine.name} engine for {url}, falling back to Chrome.")
+		# Chrome only gets what is left of the target's deadline after the HTTP attempt.
+		return self.get_target_results_with_browser(url, deadline - perf_counter())
+
+	@staticmethod
+	def remaining(url: str, deadline: float) -> float:
+		remaining = deadline - perf_counter()
+		if remaining <= 0:
+			raise TimeoutError(f"No time left to load {url} in Chrome.")
+		return remaining
+
+	def get_target_results_with_browser(self, url: str, timeout: float):
+		deadline = perf_counter() + timeout
+		self.remaining(url, deadline)
+		if self.pool is None:
+			# Without a pool there is only this scraper's own driver to share.
+			if not self._browser_lock.acquire(timeout=timeout):
+				raise TimeoutError(f"Chrome was busy for longer than {timeout:.1f}s; giving up on {url}.")
+			try:
+				if self.driver is None:
+					self.start_browser()
+				return self.scrape_with_browser(self, url, self.remaining(url, deadline))
+			finally:
+				self._browser_lock.release()
+		# Waiting for a browser counts against the deadline too, so targets queued
+		# behind a small pool time out instead of adding up.
+		with self.pool.acquire(timeout=timeout) as browser:
+			return self.scrape_with_browser(browser, url, self.remaining(url, deadline))
+
+	def record_page_load(self, url: str, engine: str, transferred: int, ready_seconds: float):
+		PAGE_LOAD_SECONDS.labels(engine=engine).observe(ready_seconds)
+		PAGE_BYTES.labels(engine=engine).observe(transferred)
+		self.page_loads[url] = {"engine": engine, "bytes": transferred, "ready_seconds": round(ready_seconds, 3)}
+
+	@staticmethod
+	def wait_for_rows(browser: ScraperTools, timeout: float):
+		"""
+		Returns as soon as the unit rows are in the DOM. A page with no units never
+		matches, so after ROWS_READY_TIMEOUT it waits for the full load instead and
+		the page is parsed as it is.
+		"""
+		try:
+			browser.wait_until_elements_by_xpath(UNIT_ROWS_XPATH, timeout=min(timeout, ROWS_READY_TIMEOUT))
+		except TimeoutException:
+			WebDriverWait(browser.driver, timeout).until(
+				lambda driver: driver.execute_script("return document.readyState") == "complete"
+			)
+
+	def wait_out_challenge(self, browser: ScraperTools, url: str, timeout: float):
+		"""
+		Polls a challenge page until it clears itself, for at most CHALLENGE_TIMEOUT
+		or what is left of `timeout`. Raises ChallengeError if it does not, so the
+		update fails and the scheduler backs off instead of waiting on anyone.
+		"""
+		self.challenged_targets.add(url)
+		tic = perf_counter()
+		try:
+			WebDriverWait(browser.driver, min(timeout, CHALLENGE_TIMEOUT), poll_frequency=1).until(
+				lambda driver: not self.is_captcha(browser)
+			)
+			outcome = "passed"
+		except TimeoutException:
+			outcome = "failed"
+		waited = perf_counter() - tic
+		self.challenge_waits[url] = waited
+		CHALLENGES.labels(engine="chrome", outcome=outcome).inc()
+		CHALLENGE_WAIT_SECONDS.labels(outcome=outcome).observe(waited)
+		if outcome == "failed":
+			self.blocked_targets.add(url)
+			raise ChallengeError(url, waited)
+		logging.info(f"Challenge for {url} cleared after {waited:.1f}s.")
+
+	def save_session(self, browser: ScraperTools):
+		"""Shares the browser's cookies (including any challenge clearance) with the HTTP engine and later runs."""
+		try:
+			self.session.save(browser.driver.get_cookies(), browser.user_agent())
+		except Exception as e:
+			logging.warning(f"Could not save browser session: {e}")
+
+	def scrape_with_browser(self, browser: ScraperTools, url: str, timeout: float):
+		browser.driver.set_page_load_timeout(timeout)
+		tic = perf_counter()
+		deadline = tic + timeout
+		# With the eager load strategy this returns at DOMContentLoaded, before the
+		# nudge modal and other late scripts run, so there is no modal to close.
+		browser.open_link(url)
+		if self.is_captcha(browser):
+			logging.info(f"Captcha detected on {url}; waiting for it to clear.")
+			self.wait_out_challenge(browser, url, self.remaining(url, deadline))
+		self.wait_for_rows(browser, self.remaining(url, deadline))
+		self.record_page_load(url, "chrome", browser.transferred_bytes(), perf_counter() - tic)
+		self.save_session(browser)
+
+		return parse_results(browser.driver.page_source, scraper_object=self)
 
+	def close(self):
+		if self.engine is not None:
+			self.engine.close()
+		super().close()
 
 def main():
 	print("Starting scraper...")
@@ -10,19 +10,53 @@
 # license           : MIT
 # py version        : 3.12.5 (must run on 3.10 or higher)
 #==============================================================================
+import logging
 from time import perf_counter
 from collections.abc import Callable
 
 # from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 import undetected_chromedriver as uc
 from pyvirtualdisplay import Display
 
 
+from timer import timer
+from browser_session import claim_profile, release_profile
 from element_find import FindElement
 from element_wait_until import WaitUntilElement
+from metrics import DRIVER_STARTUP_SECONDS
+
+
+# Requests Chrome refuses outright in lean mode (CDP Network.setBlockedURLs wildcards):
+# images, media and fonts by extension (with or without a query string), plus the
+# analytics and ad hosts the listing pages pull in.
+BLOCKED_EXTENSIONS = (
+	"png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",  # images
+	"mp4", "webm", "mov", "mp3", "m4a",  # media
+	"woff", "woff2", "ttf", "otf", "eot",  # fonts
+)
+BLOCKED_URL_PATTERNS = [
+	*(pattern for extension in BLOCKED_EXTENSIONS for pattern in (f"*.{extension}", f"*.{extension}?*")),
+	"*google-analytics.com*",
+	"*googletagmanager.com*",
+	"*doubleclick.net*",
+	"*googleadservices.com*",
+	"*facebook.net*",
+	"*facebook.com/tr*",
+	"*hotjar.com*",
+	"*clarity.ms*",
+	"*bing.com/bat*",
+	"*youtube.com*",
+]
+
+# Everything the page has downloaded so far. Cross-origin entries without
+# Timing-Allow-Origin report 0, so this is a lower bound.
+TRANSFERRED_BYTES_SCRIPT = """
+return performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))
+	.reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
 
 
 def goto_homepage(function: Callable) -> Callable:
@@ -35,21 +69,28 @@ def goto_homepage(function: Callable) -> Callable:
 
 class ScraperTools(WaitUntilElement, FindElement):
 
-	def __init__(self, init: bool = True):
-		if not init:
-			return
+	def __init__(self, init: bool = True, lean: bool = True, persistent_profile: bool = True):
+		self.driver = None
+		self.display = None
+		# Lean mode returns from get() at DOMContentLoaded and never fetches blocked assets.
+		self.lean = lean
+		# A persistent profile keeps cookies and challenge clearance between runs.
+		self.persistent_profile = persistent_profile
+		self.profile_slot = None
+		if init:
+			self.start_browser()
+
+	def start_browser(self):
 		tic = perf_counter()
 		display = Display(visible=0, size=(800, 600))
 		display.start()
-		capabilities = DesiredCapabilities.CHROME
-		capabilities['goog:loggingPrefs'] = {'performance': 'ALL'}  # type: ignore[assignment]
 		options = uc.ChromeOptions()
-		# user_data_dir = os.path.abspath("selenium_data")
+		if self.lean:
+			options.page_load_strategy = "eager"
 		# options.add_argument("--autoplay-policy=no-user-gesture-required")
 		# options.add_argument("log-level=3")
 		options.add_argument("--no-sandbox")
 		# options.add_experimental_option("prefs", {"download_restrictions": 3})  # Disable downloads
-		# options.add_argument(f"user-data-dir={user_data_dir}")
 		# options.add_argument("--ignore-certificate-errors-spki-list")
 		# # for extension in os.listdir("chrome_extensions"):
 		# # 	options.add_extension(f"chrome_extensions/{extension}")
@@ -58,15 +99,31 @@ class ScraperTools(WaitUntilElement, FindElement):
 		# 	options.add_argument("--window-size=1920,1080")
 		# 	# options.add_argument("--disable-gpu")
 		# 	options.add_argument("--mute-audio")
-		self.driver = uc.Chrome(options=options)
+		user_data_dir = None
+		if self.persistent_profile:
+			self.profile_slot, user_data_dir = claim_profile()
+		try:
+			self.driver = uc.Chrome(options=options, user_data_dir=user_data_dir)
+		except BaseException:
+			display.stop()
+			self.release_profile()
+			raise
 		self.display = display
+		if self.lean:
+			self.driver.execute_cdp_cmd("Network.enable", {})
+			self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
 		super().__init__(self.driver)
 		toc = perf_counter()
-		print(f"Completed init in {toc-tic:.2f}s.")
+		DRIVER_STARTUP_SECONDS.observe(toc - tic)
+		logging.info(f"Started browser in {toc - tic:.2f}s.")
 
+	@timer
 	def open_link(self, url: str):
 		self.driver.get(url)
 
+	def transferred_bytes(self) -> int:
+		return int(self.driver.execute_script(TRANSFERRED_BYTES_SCRIPT) or 0)
+
 	def redirect(self, url: str):
 		if self.current_url() == url:
 			return
@@ -94,10 +151,34 @@ class ScraperTools(WaitUntilElement, FindElement):
 		return self.driver.current_url
 
 	def close(self):
-		self.driver.close()
-		self.driver.quit()
-		# self.display.stop()
-		# print("Closed driver.")
+		# Each step runs even if an earlier one raises: a crashed Chrome must
+		# still give back its Xvfb display and its profile slot.
+		try:
+			if self.driver is not None:
+				driver, self.driver = self.driver, None
+				try:
+					driver.close()
+				except WebDriverException:
+					# The window is already gone if Chrome crashed; quit() still
+					# has to run to reap the chromedriver process.
+					pass
+				finally:
+					driver.quit()
+		finally:
+			try:
+				if self.display is not None:
+					display, self.display = self.display, None
+					display.stop()
+			finally:
+				self.release_profile()
+
+	def release_profile(self):
+		if self.profile_slot is not None:
+			release_profile(self.profile_slot)
+			self.profile_slot = None
+
+	def user_agent(self) -> str:
+		return self.driver.execute_script("return navigator.userAgent")
 
 	def refresh(self):
 		self.driver.refresh()
@@ -28,6 +28,9 @@ document.addEventListener('DOMContentLoaded', () => {
     let allDeletedApartments = [];
     let currentFilteredApartments = [];
     let currentFilteredDeletedApartments = [];
+    let dataVersion = null;
+    let changeStream = null;
+    let changePolling = false;
     let mapVisible = false;
     let mapImageElement = null;
     let mapImageNaturalWidth = 0;
@@ -36,6 +39,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let mapPointPopover = null;
     let pinnedApartmentForPopover = null;
     const API_BASE_URL = '/api/v1';
+    const CHANGE_POLL_WAIT_SECONDS = 25;
+    const CHANGE_POLL_RETRY_MS = 30000;
 
     // --- Helper & Popover Functions ---
     function getBuildingNumber(name) { const match = name?.match(/^#?(\d+)-/); return match ? match[1] : null; }
@@ -214,6 +219,52 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // --- Incremental Updates ---
+    // Applies a /changes delta: upserted rows replace or join the available list, archived rows move to the archive.
+    function applyChanges(changes) {
+        if (changes.reset) { initialDataLoad(); return; }
+        if (!changes.upserted.length && !changes.archived.length) { dataVersion = changes.version; return; }
+        const changedNames = new Set([...changes.upserted, ...changes.archived].map(apt => apt.name));
+        allApartments = allApartments.filter(apt => !changedNames.has(apt.name)).concat(changes.upserted);
+        allDeletedApartments = allDeletedApartments.filter(apt => !changedNames.has(apt.name)).concat(changes.archived);
+        dataVersion = changes.version;
+        populateFilters();
+        applyFiltersAndSorting();
+    }
+    async function fetchChanges() {
+        const changes = await fetch(`${API_BASE_URL}/apartments/changes?since=${dataVersion}`).then(res => res.json());
+        applyChanges(changes);
+    }
+    // Long-polls /changes; the server answers at once with Retry-After when all its waiting slots are taken.
+    async function pollChanges() {
+        let delay = 0;
+        try {
+            const res = await fetch(`${API_BASE_URL}/apartments/changes?since=${dataVersion}&wait=${CHANGE_POLL_WAIT_SECONDS}`);
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            applyChanges(await res.json());
+            delay = Number(res.headers.get('Retry-After') || 0) * 1000;
+        } catch (error) {
+            console.error("Change poll error:", error);
+            delay = CHANGE_POLL_RETRY_MS;
+        }
+        setTimeout(pollChanges, delay);
+    }
+    // Scheduled updates are pushed over server-sent events; the browser reconnects with Last-Event-ID by itself.
+    // If the stream is refused (the server has no thread to spare) or unsupported, fall back to polling.
+    function subscribeToChanges() {
+        if (changeStream || changePolling || dataVersion === null) return;
+        const startPolling = () => { changePolling = true; pollChanges(); };
+        if (!window.EventSource) { startPolling(); return; }
+        changeStream = new EventSource(`${API_BASE_URL}/apartments/changes/stream?since=${dataVersion}`);
+        changeStream.addEventListener('changes', (event) => applyChanges(JSON.parse(event.data)));
+        changeStream.addEventListener('error', () => {
+            // A refused or failed response closes the stream for good; dropped connections are retried by the browser.
+            if (changeStream.readyState !== EventSource.CLOSED) return;
+            changeStream = null;
+            startPolling();
+        });
+    }
+
     // --- Event Handlers & Initial Load ---
     async function initialDataLoad() {
         loadingIndicator.style.display = 'block';
@@ -221,7 +272,7 @@ document.addEventListener('DOMContentLoaded', () => {
         document.querySelectorAll('button, select').forEach(el => el.disabled = true);
         try {
             const [apts, deletedApts] = await Promise.all([
-                fetch(`${API_BASE_URL}/apartments`).then(res => res.json()),
+                fetch(`${API_BASE_URL}/apartments`).then(res => { dataVersion = res.headers.get('X-Data-Version'); return res.json(); }),
                 fetch(`${API_BASE_URL}/apartments/deleted`).then(res => res.json())
             ]);
             if (!Array.isArray(apts) || !Array.isArray(deletedApts)) throw new Error("Invalid API response.");
@@ -230,6 +281,7 @@ document.addEventListener('DOMContentLoaded', () => {
             updateStatus.textContent = 'Data loaded.';
             populateFilters();
             applyFiltersAndSorting();
+            subscribeToChanges();
         } catch (error) {
             updateStatus.textContent = 'Error loading data.';
             console.error("Data load error:", error);
@@ -249,9 +301,21 @@ document.addEventListener('DOMContentLoaded', () => {
         updateStatus.textContent = 'Initiating update...';
         updateButton.disabled = true;
         try {
-            await fetch(`${API_BASE_URL}/update`, { method: 'POST' });
-            updateStatus.textContent = 'Update started. Refreshing in 5s...';
-            setTimeout(initialDataLoad, 5000);
+            const job = await fetch(`${API_BASE_URL}/update`, { method: 'POST' }).then(res => res.json());
+            updateStatus.textContent = 'Update started...';
+            const pollJob = async () => {
+                const status = await fetch(job.status_url).then(res => { if (!res.ok) throw new Error(`HTTP ${res.status}`); return res.json(); });
+                if (status.state === 'queued' || status.state === 'running') {
+                    updateStatus.textContent = `Updating${status.current_phase ? ` (${status.current_phase})` : ''}...`;
+                    setTimeout(pollSafely, 2000);
+                    return;
+                }
+                updateStatus.textContent = status.state === 'succeeded' ? 'Update complete.' : 'Update failed.';
+                updateButton.disabled = false;
+                if (status.state === 'succeeded') fetchChanges().catch(() => initialDataLoad());
+            };
+            const pollSafely = () => pollJob().catch(() => { updateStatus.textContent = 'Update status unavailable.'; updateButton.disabled = false; });
+            setTimeout(pollSafely, 1000);
         } catch (error) {
             updateStatus.textContent = `Update failed.`;
             updateButton.disabled = false;
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# filename          : streaming.py
+# description       : Chunked JSON array / NDJSON responses for large listings
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : Bodies are produced batch by batch from the SQLite cursor and,
+#                     when accepted, gzipped incrementally, so memory does not grow
+#                     with the number of rows. Streamed bodies bypass ResponseCache.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import zlib
+from collections.abc import Iterable, Iterator
+
+from flask import Response, request, stream_with_context
+
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson")
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson() -> bool:
+	"""True when the client's Accept header prefers NDJSON over a JSON array."""
+	return request.accept_mimetypes.best_match(["application/json", *NDJSON_MIMETYPES]) in NDJSON_MIMETYPES
+
+
+def json_array_chunks(batches: Iterable[list[str]]) -> Iterator[str]:
+	"""Joins batches of serialized objects into the pieces of one JSON array."""
+	yield "["
+	separator = ""
+	for batch in batches:
+		if batch:
+			yield separator + ",".join(batch)
+			separator = ","
+	yield "]"
+
+
+def ndjson_chunks(batches: Iterable[list[str]]) -> Iterator[str]:
+	for batch in batches:
+		if batch:
+			yield "\n".join(batch) + "\n"
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+	"""Gzips a stream, flushing after every chunk so each batch reaches the client as it is produced."""
+	compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+	for chunk in chunks:
+		yield compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+	yield compressor.flush()
+
+
+def streamed_response(batches: Iterable[list[str]], ndjson: bool) -> Response:
+	"""Streams batches of serialized objects as a JSON array, or as NDJSON when `ndjson` is set."""
+	chunks = ndjson_chunks(batches) if ndjson else json_array_chunks(batches)
+	encoding = request.accept_encodings.best_match(["gzip", "identity"]) or "identity"
+	body = gzip_chunks(chunks) if encoding == "gzip" else (chunk.encode("utf-8") for chunk in chunks)
+	response = Response(stream_with_context(body), mimetype=NDJSON_MIMETYPES[0] if ndjson else "application/json")
+	if encoding == "gzip":
+		response.headers["Content-Encoding"] = "gzip"
+	response.headers["Vary"] = "Accept, Accept-Encoding"
+	response.cache_control.no_cache = True
+	return response
@@ -3,22 +3,29 @@
 # description       : Decorator function for performance measurement
 # author            : Rico
 # email             : rico@rico.cx
-# date              : 04-29-2025
-# version           : v1.0
+# date              : 10-18-2026
+# version           : v2.0
 # usage             : This file should not be run directly.
-# notes             : This file should not be run directly.
+# notes             : Records each call's duration in the apartments_function_seconds
+#                     histogram (labelled by qualified name) instead of printing it.
 # license           : MIT
 # py version        : 3.13.1 (must run on 3.10 or higher)
 #==============================================================================
 from time import perf_counter
+from functools import wraps
 from collections.abc import Callable
 
+from metrics import FUNCTION_SECONDS
+
 
 def timer(function: Callable) -> Callable:
+	histogram = FUNCTION_SECONDS.labels(function=function.__qualname__)
+
+	@wraps(function)
 	def wrapper(*args, **kwargs):
 		tic = perf_counter()
-		result = function(*args, **kwargs)
-		toc = perf_counter()
-		print(f"{function.__name__} took {toc - tic:0.2f} second{'' if toc - tic == 1 else 's'}.")
-		return result
+		try:
+			return function(*args, **kwargs)
+		finally:
+			histogram.observe(perf_counter() - tic)
 	return wrapper
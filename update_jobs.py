@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# filename          : update_jobs.py
+# description       : Single-flight background runner for scrape/sync updates
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : At most one update is queued or running at a time; triggers
+#                     that arrive meanwhile are coalesced onto that job. With a
+#                     JobStore, each status change is also written to the
+#                     database so other server processes can report it.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import json
+import uuid
+import logging
+import sqlite3
+import threading
+from time import time, perf_counter
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from database import ConnectionManager
+from metrics import UPDATE_PHASE_SECONDS
+
+
+@dataclass
+class UpdateJob:
+	trigger: str
+	id: str = field(default_factory=lambda: uuid.uuid4().hex)
+	state: str = "queued"  # queued -> running -> succeeded | failed
+	submitted_at: float = field(default_factory=time)
+	started_at: float | None = None
+	finished_at: float | None = None
+	current_phase: str | None = None
+	phases: dict[str, float] = field(default_factory=dict)
+	counts: dict[str, int] = field(default_factory=dict)
+	pages: dict[str, dict] = field(default_factory=dict)  # search URL -> engine, bytes, ready_seconds
+	error: str | None = None
+	coalesced_triggers: list[str] = field(default_factory=list)
+	done: threading.Event = field(default_factory=threading.Event, repr=False)
+	on_change: Callable[["UpdateJob"], None] | None = field(default=None, repr=False)
+
+	def changed(self):
+		if self.on_change is not None:
+			self.on_change(self)
+
+	@contextmanager
+	def phase(self, name: str):
+		"""Times a named step of the job and exposes it as the current phase."""
+		self.current_phase = name
+		self.changed()
+		tic = perf_counter()
+		try:
+			yield
+		finally:
+			elapsed = perf_counter() - tic
+			self.phases[name] = round(elapsed, 3)
+			UPDATE_PHASE_SECONDS.labels(phase=name).observe(elapsed)
+			self.current_phase = None
+
+	def fail(self, error: BaseException | str):
+		self.error = str(error)
+
+	@property
+	def duration(self) -> float | None:
+		if self.started_at is None:
+			return None
+		return round((self.finished_at or time()) - self.started_at, 3)
+
+	def to_dict(self) -> dict:
+		return {
+			"id": self.id,
+			"trigger": self.trigger,
+			"state": self.state,
+			"submitted_at": self.submitted_at,
+			"started_at": self.started_at,
+			"finished_at": self.finished_at,
+			"duration": self.duration,
+			"current_phase": self.current_phase,
+			"phases": dict(self.phases),
+			"counts": dict(self.counts),
+			"pages": dict(self.pages),
+			"error": self.error,
+			"coalesced_triggers": list(self.coalesced_triggers),
+		}
+
+
+class JobStore:
+	"""The latest status of recent jobs in the update_jobs table, readable from every process."""
+	def __init__(self, database: str, history: int = 50):
+		self.history = history
+		self._manager = ConnectionManager(database)
+
+	def save(self, job: UpdateJob):
+		db = self._manager.connect()
+		try:
+			with db:
+				db.execute(
+					"""INSERT INTO update_jobs (id, state, submitted_at, status) VALUES (?, ?, ?, ?)
+					   ON CONFLICT (id) DO UPDATE SET state = excluded.state, status = excluded.status""",
+					(job.id, job.state, job.submitted_at, json.dumps(job.to_dict()))
+				)
+				if job.state == "queued":
+					db.execute(
+						"DELETE FROM update_jobs WHERE id NOT IN (SELECT id FROM update_jobs ORDER BY submitted_at DESC LIMIT ?)",
+						(self.history,)
+					)
+		finally:
+			db.close()
+
+	def load(self, job_id: str) -> dict | None:
+		db = self._manager.connect()
+		try:
+			row = db.execute("SELECT status FROM update_jobs WHERE id = ?", (job_id,)).fetchone()
+		finally:
+			db.close()
+		return json.loads(row["status"]) if row else None
+
+
+class UpdateJobRunner:
+	def __init__(self, run: Callable[[UpdateJob], None], history: int = 50, store: JobStore | None = None):
+		self._run = run
+		self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="update")
+		self._lock = threading.Lock()
+		self._active: UpdateJob | None = None
+		self._jobs: OrderedDict[str, UpdateJob] = OrderedDict()
+		self._history = history
+		self.store = store
+		# Snapshots are taken and written under one lock, so an older one never lands last.
+		self._store_lock = threading.Lock()
+
+	def _persist(self, job: UpdateJob):
+		if self.store is None:
+			return
+		try:
+			with self._store_lock:
+				self.store.save(job)
+		except sqlite3.Error as e:
+			# Only other processes read the stored copy; never fail the update over it.
+			logging.warning(f"Could not store status of update job {job.id}: {e}")
+
+	def submit(self, trigger: str) -> tuple[UpdateJob, bool]:
+		"""Queues an update unless one is already queued or running. Returns the job and whether it is new."""
+		with self._lock:
+			created = self._active is None
+			if created:
+				job = UpdateJob(trigger=trigger, on_change=self._persist)
+				self._active = job
+				self._jobs[job.id] = job
+				while len(self._jobs) > self._history:
+					self._jobs.popitem(last=False)
+			else:
+				job = self._active
+				job.coalesced_triggers.append(trigger)
+				logging.info(f"Update trigger '{trigger}' coalesced into job {job.id}.")
+		job.changed()
+		if created:
+			self._executor.submit(self._execute, job)
+		return job, created
+
+	def run(self, trigger: str, timeout: float | None = None) -> UpdateJob:
+		"""Submits (or joins) an update and blocks until it finishes."""
+		job, _created = self.submit(trigger)
+		job.done.wait(timeout)
+		return job
+
+	def _execute(self, job: UpdateJob):
+		job.state = "running"
+		job.started_at = time()
+		job.changed()
+		try:
+			self._run(job)
+		except Exception as e:
+			logging.error(f"Update job {job.id} crashed: {e}", exc_info=True)
+			job.fail(e)
+		finally:
+			job.finished_at = time()
+			job.state = "failed" if job.error else "succeeded"
+			job.changed()
+			with self._lock:
+				self._active = None
+			job.done.set()
+
+	def get(self, job_id: str) -> UpdateJob | None:
+		with self._lock:
+			return self._jobs.get(job_id)
+
+	def status(self, job_id: str) -> dict | None:
+		"""A job's status from this process, or as last stored by whichever process ran it."""
+		job = self.get(job_id)
+		if job is not None:
+			return job.to_dict()
+		return self.store.load(job_id) if self.store else None
+
+	@property
+	def active(self) -> UpdateJob | None:
+		return self._active
+
+	def shutdown(self):
+		self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# filename          : update_schedule.py
+# description       : Adaptive interval between scheduled scrape/sync updates
+# author            : Rico
+# email             : rico@rico.cx
+# date              : 10-18-2026
+# version           : v1.0
+# usage             : This file should not be run directly.
+# notes             : The interval shrinks after runs that found changes and grows
+#                     exponentially after quiet runs, failures and challenges.
+#                     Every decision is kept with its reason for the API.
+# license           : MIT
+# py version        : 3.10+
+#==============================================================================
+import random
+import logging
+import threading
+from time import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, asdict
+
+from update_jobs import UpdateJob
+
+
+@dataclass
+class ScheduleDecision:
+	decided_at: float
+	outcome: str  # initial | changed | quiet | failed | challenged
+	reason: str
+	interval: float  # seconds, before jitter
+	delay: float  # seconds until the next run, after jitter
+	next_run_at: float
+	job_id: str | None = None
+
+	def to_dict(self) -> dict:
+		return asdict(self)
+
+
+class AdaptiveSchedule:
+	def __init__(self, base_interval: float = 30 * 60, min_interval: float = 5 * 60, max_interval: float = 4 * 60 * 60,
+	             speedup: float = 0.5, quiet_backoff: float = 1.5, failure_backoff: float = 2.0, challenge_backoff: float = 3.0,
+	             jitter: float = 0.1, history: int = 50, rand: Callable[[], float] = random.random):
+		if not 0 < min_interval <= base_interval <= max_interval:
+			raise ValueError("Intervals must satisfy 0 < min_interval <= base_interval <= max_interval.")
+		self.base_interval = base_interval
+		self.min_interval = min_interval
+		self.max_interval = max_interval
+		self.speedup = speedup
+		self.quiet_backoff = quiet_backoff
+		self.failure_backoff = failure_backoff
+		self.challenge_backoff = challenge_backoff
+		self.jitter = jitter
+		self.interval = base_interval
+		self._rand = rand
+		self._lock = threading.Lock()
+		self._decisions: deque[ScheduleDecision] = deque(maxlen=history)
+
+	def _clamp(self, seconds: float) -> float:
+		return min(self.max_interval, max(self.min_interval, seconds))
+
+	@staticmethod
+	def classify(job: UpdateJob) -> tuple[str, str]:
+		"""Maps a finished job to an outcome and a human-readable reason. A challenge only
+		counts when Chrome could not get past it and the target failed; those win over other
+		failures, since they are usually what made the run fail. Challenges the fallback got
+		past are routine, so such runs are judged by their changes like any other."""
+		failures = job.counts.get("challenge_failures", 0)
+		if failures:
+			reason = f"{failures} search target(s) failed on an anti-bot challenge"
+			return "challenged", f"{reason}; update failed: {job.error}" if job.error else reason
+		if job.error:
+			return "failed", f"update failed: {job.error}"
+		changes = sum(job.counts.get(key, 0) for key in ("inserted", "updated", "archived"))
+		if changes:
+			return "changed", f"{changes} listing change(s) found"
+		return "quiet", "no listing changes found"
+
+	def decide(self, job: UpdateJob | None = None, now: float | None = None) -> ScheduleDecision:
+		"""Adjusts the interval for the outcome of `job` (None for the first run) and records the decision."""
+		now = time() if now is None else now
+		with self._lock:
+			if job is None:
+				outcome, reason = "initial", "first run after startup"
+				interval = self.interval
+			else:
+				outcome, reason = self.classify(job)
+				factor = {
+					"changed": self.speedup,
+					"quiet": self.quiet_backoff,
+					"failed": self.failure_backoff,
+					"challenged": self.challenge_backoff,
+				}[outcome]
+				interval = self._clamp(self.interval * factor)
+				verb = "shortening" if interval < self.interval else "lengthening" if interval > self.interval else "keeping"
+				reason = f"{reason}; {verb} interval to {interval / 60:.1f} min"
+			self.interval = interval
+			delay = self._clamp(interval * (1 + self.jitter * (2 * self._rand() - 1)))
+			decision = ScheduleDecision(
+				decided_at=now,
+				outcome=outcome,
+				reason=reason,
+				interval=round(interval, 1),
+				delay=round(delay, 1),
+				next_run_at=now + delay,
+				job_id=job.id if job else None,
+			)
+			self._decisions.append(decision)
+		logging.info(f"Next scheduled update in {delay / 60:.1f} min ({reason}).")
+		return decision
+
+	def to_dict(self) -> dict:
+		with self._lock:
+			decisions = [decision.to_dict() for decision in reversed(self._decisions)]
+		return {
+			"interval": round(self.interval, 1),
+			"base_interval": self.base_interval,
+			"min_interval": self.min_interval,
+			"max_interval": self.max_interval,
+			"jitter": self.jitter,
+			"next_run_at": decisions[0]["next_run_at"] if decisions else None,
+			"decisions": decisions,
+		}
@@ -1,16 +1,111 @@
+import os
+import signal
+import socket
+import logging
+import argparse
+import multiprocessing
+from multiprocessing.connection import wait
+
 from waitress import serve
 
 import api
+from database import reset_managers
 
 
-def main():
-	serve(
-		api.app,
-		host="0.0.0.0",
-		port=5000,
-		threads=2,
-		url_scheme="https"
+def parse_args() -> argparse.Namespace:
+	"""Serving settings; each flag defaults to its environment variable."""
+	parser = argparse.ArgumentParser(description="Serve the apartments API with waitress.")
+	parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+	parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+	parser.add_argument("--threads", type=int, default=int(os.environ.get("WAITRESS_THREADS", 2)),
+	                    help="Request threads per process.")
+	parser.add_argument("--processes", type=int, default=int(os.environ.get("WAITRESS_PROCESSES", 1)),
+	                    help="Worker processes sharing the listening socket.")
+	parser.add_argument("--connection-limit", type=int, default=int(os.environ.get("WAITRESS_CONNECTION_LIMIT", 100)),
+	                    help="Open connections per process before new ones wait.")
+	parser.add_argument("--backlog", type=int, default=int(os.environ.get("WAITRESS_BACKLOG", 1024)))
+	parser.add_argument("--change-clients", type=int, default=os.environ.get("CHANGE_STREAM_MAX_CLIENTS"),
+	                    help="Change streams and long-polls per process; always kept below --threads.")
+	return parser.parse_args()
+
+
+def change_client_limit(args: argparse.Namespace) -> int:
+	"""Open streams and long-polls each pin a request thread, so at least one thread is always left for other requests."""
+	limit = args.threads - 1
+	if args.change_clients is not None:
+		limit = min(int(args.change_clients), limit)
+	return max(limit, 0)
+
+
+def exit_on_sigterm(signum, frame):
+	# Unwind normally so atexit handlers run, e.g. handing back the scheduler lease.
+	raise SystemExit(0)
+
+
+def serve_worker(sockets: list[socket.socket], args: argparse.Namespace):
+	signal.signal(signal.SIGTERM, exit_on_sigterm)
+	# Never reuse a connection opened before the fork, and size the pool for this worker.
+	reset_managers(close=False)
+	# Each request thread keeps its own pooled SQLite connection.
+	app = api.create_app(
+		{"DATABASE_POOL_SIZE": args.threads, "CHANGE_STREAM_MAX_CLIENTS": change_client_limit(args)},
+		start_updates=True
 	)
+	try:
+		serve(
+			app,
+			sockets=sockets,
+			threads=args.threads,
+			connection_limit=args.connection_limit,
+			url_scheme="https"
+		)
+	finally:
+		# multiprocessing workers exit without running atexit, so do its work here: drop queued
+		# updates, hand the lease back and quit the warm browsers (Chrome and Xvfb) this worker started.
+		api.update_runner.shutdown()
+		if api.leader:
+			api.leader.stop()
+		if api.browser_pool:
+			api.browser_pool.close()
+
+
+def main():
+	args = parse_args()
+	if args.processes <= 1:
+		serve_worker([socket.create_server((args.host, args.port), backlog=args.backlog)], args)
+		return
+
+	# Migrate once up front so the workers don't race each other upgrading the schema,
+	# then close the connections it pooled so none is inherited by a worker.
+	api.create_app()
+	reset_managers()
+	listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+	workers: dict[int, multiprocessing.Process] = {}
+
+	def start_worker():
+		worker = multiprocessing.Process(target=serve_worker, args=([listener], args), daemon=True)
+		worker.start()
+		workers[worker.sentinel] = worker
+
+	signal.signal(signal.SIGTERM, exit_on_sigterm)
+	for _ in range(args.processes):
+		start_worker()
+	logging.info(f"Serving on {args.host}:{args.port} with {args.processes} processes x {args.threads} threads.")
+	try:
+		# Replace workers that die; the scheduler lease moves to a survivor on its own.
+		while True:
+			for sentinel in wait(list(workers)):
+				worker = workers.pop(sentinel)
+				worker.join()
+				logging.warning(f"Worker {worker.pid} exited with {worker.exitcode}; restarting it.")
+				start_worker()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		for worker in workers.values():
+			worker.terminate()
+		for worker in workers.values():
+			worker.join()
 
 
 if __name__ == "__main__":